@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Benchmark claude_chat_analyzer on a synthetic ~/.claude/projects tree
+
+Usage:
+    # Default corpus, JSON results on stdout
+    python chat_benchmark.py
+
+    # Bigger corpus, saved for comparison with a later commit
+    python chat_benchmark.py --projects 20 --files 50 --output before.json
+    python chat_benchmark.py --projects 20 --files 50 --compare before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List
+
+STAGES = ["get_project_info", "filter_files", "process_files"]
+TOOLS = ["Read", "Bash", "Grep", "Edit", "Write", "Glob"]
+STUB_CONVERTER = '#!/bin/sh\ncp "$1" "$2/$(basename "$1" .jsonl).md"\n'
+
+
+def generate_corpus(root: Path, args) -> Dict:
+    """Write projects/files/records under root; returns corpus totals"""
+    rng = random.Random(args.seed)
+    now = time.time()
+    totals = {"projects": args.projects, "files": 0, "records": 0, "bytes": 0}
+
+    for p in range(args.projects):
+        project_dir = root / f"-Users-bench-code-project{p}"
+        project_dir.mkdir(parents=True)
+        for _ in range(args.files):
+            session = str(uuid.uuid4())
+            records = rng.randint(max(1, args.records // 2), args.records * 3 // 2)
+            start = now - rng.uniform(0, args.span_days * 86400)
+            path = project_dir / f"{session}.jsonl"
+            with open(path, "w", encoding="utf-8") as fp:
+                for record in session_records(rng, session, records, start, args):
+                    fp.write(json.dumps(record) + "\n")
+            last = start + records * 20
+            os.utime(path, (last, last))
+            totals["files"] += 1
+            totals["records"] += records
+            totals["bytes"] += path.stat().st_size
+    return totals
+
+
+def session_records(rng: random.Random, session: str, count: int, start, args):
+    """Prompt, reply with tool call, tool result; repeated with a mix of extras"""
+    parent = None
+    yield {"type": "summary", "summary": f"Benchmark session {session[:8]}"}
+    for i in range(count):
+        step = i % 3
+        if step == 0:
+            message = {"role": "user", "content": f"Please look at issue {i}"}
+        elif step == 1:
+            content = [{"type": "text", "text": f"Checking issue {i}. " * 8}]
+            if rng.random() < args.thinking_ratio:
+                content.insert(0, {"type": "thinking", "thinking": "Hmm. " * 60})
+            content.append(
+                {
+                    "type": "tool_use",
+                    "id": f"toolu_{i}",
+                    "name": rng.choice(TOOLS),
+                    "input": {"file_path": f"/src/module{i % 7}.py"},
+                }
+            )
+            message = {
+                "id": f"msg_{session[:8]}_{i}",
+                "role": "assistant",
+                "content": content,
+                "usage": {"input_tokens": 1200, "output_tokens": 150},
+            }
+        else:
+            size = int(rng.expovariate(1 / (args.tool_output_kb * 1024))) + 1
+            message = {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "tool_result",
+                        "tool_use_id": f"toolu_{i - 1}",
+                        "content": ("x" * 79 + "\n") * (size // 80 + 1),
+                    }
+                ],
+            }
+        record_id = str(uuid.uuid4())
+        timestamp = time.gmtime(start + i * 20)
+        yield {
+            "parentUuid": parent,
+            "isSidechain": rng.random() < args.sidechain_ratio,
+            "type": message["role"],
+            "message": message,
+            "uuid": record_id,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", timestamp),
+            "sessionId": session,
+        }
+        parent = record_id
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def reset_peak_rss():
+    """Restart the peak RSS count where the kernel allows it (Linux)"""
+    with contextlib.suppress(OSError):
+        with open("/proc/self/clear_refs", "w") as fp:
+            fp.write("5")
+
+
+def time_stage(run: Callable, repeat: int) -> Dict:
+    """Wall time of each run (the first is against cold caches) and peak RSS"""
+    reset_peak_rss()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        runs.append(time.perf_counter() - start)
+    return {
+        "cold_s": runs[0],
+        "warm_median_s": statistics.median(runs[1:]) if repeat > 1 else None,
+        "runs_s": runs,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_benchmark(home: Path, args) -> Dict:
+    # The analyzer resolves its projects and cache directories at import
+    os.environ["HOME"] = str(home)
+    os.environ["XDG_CACHE_HOME"] = str(home / ".cache")
+    bin_dir = home / "bin"
+    bin_dir.mkdir()
+    stub = bin_dir / "claude2md"
+    stub.write_text(STUB_CONVERTER)
+    stub.chmod(0o755)
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+
+    sys.path.insert(0, str(Path(__file__).parent))
+    from claude_chat_analyzer import ChatAnalyzer
+
+    projects_dir = home / ".claude" / "projects"
+    start = time.perf_counter()
+    corpus = generate_corpus(projects_dir, args)
+    corpus["generate_s"] = time.perf_counter() - start
+
+    converter = "claude2md" if args.converter == "stub" else args.converter
+    analyzer = ChatAnalyzer(converter=converter, cache_mb=args.cache_size)
+    # Generated names need no unquoting; asking the analyzer would warm its index
+    names = sorted(entry.name for entry in projects_dir.iterdir())
+    files: List[Path] = []
+    outputs: List[Path] = []
+
+    # registry() is memoized per analyzer, so each run re-reads the tree the
+    # way a fresh invocation would; warm runs then time the incremental scan
+    def get_project_info():
+        analyzer.refresh()
+        analyzer.get_project_info()
+
+    def filter_files():
+        analyzer.refresh()
+        files[:] = analyzer.filter_files(names, args.max_age)
+
+    def process_files():
+        outputs.append(analyzer.process_files(files, jobs=args.jobs))
+
+    results = {"get_project_info": time_stage(get_project_info, args.repeat)}
+    results["filter_files"] = time_stage(filter_files, args.repeat)
+    results["filter_files"]["selected_files"] = len(files)
+    results["process_files"] = time_stage(process_files, args.repeat)
+    results["process_files"]["output_bytes"] = outputs[-1].stat().st_size
+    for output in outputs:
+        output.unlink(missing_ok=True)
+
+    return {"corpus": corpus, "stages": results}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(current: Dict, baseline: Dict):
+    """Print per-stage changes against an earlier results file"""
+    print(
+        f"\nBaseline {baseline.get('commit') or '?'} -> {current.get('commit') or '?'}",
+        file=sys.stderr,
+    )
+    print(
+        f"{'Stage':<17} {'Metric':<14} {'Baseline':>9} {'Current':>10} {'Change':>8}",
+        file=sys.stderr,
+    )
+    for stage in STAGES:
+        for metric in ("cold_s", "warm_median_s", "peak_rss_mb"):
+            before = baseline["stages"].get(stage, {}).get(metric)
+            after = current["stages"][stage].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            print(
+                f"{stage:<17} {metric:<14} {before:>9.3f} {after:>10.3f} "
+                f"{change:>+7.1f}%",
+                file=sys.stderr,
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark claude_chat_analyzer on a synthetic session corpus"
+    )
+    parser.add_argument("--projects", type=int, default=5, help="Number of projects")
+    parser.add_argument("--files", type=int, default=20, help="Sessions per project")
+    parser.add_argument(
+        "--records", type=int, default=300, help="Average records per session"
+    )
+    parser.add_argument(
+        "--tool-output-kb",
+        type=float,
+        default=2.0,
+        help="Average tool result size in KB (exponentially distributed)",
+    )
+    parser.add_argument("--thinking-ratio", type=float, default=0.2)
+    parser.add_argument("--sidechain-ratio", type=float, default=0.1)
+    parser.add_argument(
+        "--span-days", type=float, default=30, help="Spread of session start times"
+    )
+    parser.add_argument("--max-age", default="7d", help="Window for filter_files")
+    parser.add_argument(
+        "--converter",
+        choices=["stub", "native"],
+        default="stub",
+        help="stub copies each session through a fake claude2md (default: stub)",
+    )
+    parser.add_argument("--cache-size", type=int, default=0, help="Cache MB")
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Write JSON results here")
+    parser.add_argument("--compare", type=Path, help="Earlier results to diff against")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the generated corpus directory"
+    )
+    args = parser.parse_args()
+    if min(args.projects, args.files, args.records, args.repeat) < 1:
+        parser.error("--projects, --files, --records and --repeat must be positive")
+
+    home = Path(tempfile.mkdtemp(prefix="claude-chat-bench-"))
+    try:
+        report = run_benchmark(home, args)
+    finally:
+        if args.keep:
+            print(f"Corpus kept in {home}", file=sys.stderr)
+        else:
+            shutil.rmtree(home, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()
+        },
+        **report,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Per-project zip bundles of old sessions, readable one member at a time."""
+
+import os
+import shutil
+import sqlite3
+import time
+import warnings
+import zipfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from chat_index import CACHE_DIR, add_columns
+
+ARCHIVE_DIR = Path.home() / ".claude" / "projects-archive"
+UNBUNDLED_DIR = CACHE_DIR / "unbundled"
+COMPRESS_LEVEL = 6
+# Extracted copies not asked for in this long are deleted by prune()
+UNBUNDLED_SECONDS = 24 * 3600
+
+
+class BundleStore:
+    """Moves sessions out of the projects tree into <project>.zip bundles.
+
+    Each session is compressed as its own zip member, and the zip's central
+    directory is the member index, so one session is read back by seeking
+    to it and inflating only that member. The bundled table maps each
+    session's original path to its bundle, which keeps it in reach of
+    --session, exports and the search and stats indexes after the live
+    file is gone.
+
+    Readers that need a real file (the line index mmaps sessions) get a
+    copy extracted under UNBUNDLED_DIR. The copy keeps the original mtime,
+    so conversions cached for it stay valid between runs and after it is
+    extracted again. prune() deletes copies that have not been asked for
+    lately; deleting that directory is always safe.
+
+    Lookups see only sessions bundled from roots, or from every root when
+    roots is None.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        archive_dir: Path = ARCHIVE_DIR,
+        unbundled_dir: Path = UNBUNDLED_DIR,
+        roots: Optional[List[str]] = None,
+    ):
+        self.conn = conn
+        self.archive_dir = archive_dir
+        self.unbundled_dir = unbundled_dir
+        self.roots = roots
+        # When a copy of the session was last handed out
+        add_columns(self.conn, "bundled", {"used": "REAL NOT NULL DEFAULT 0"})
+
+    def bundle_path(self, project: str) -> Path:
+        return self.archive_dir / f"{project}.zip"
+
+    def archive(self, files: List[Tuple[Path, str, str, int, float]]) -> Dict[str, int]:
+        """Move (path, root, project, size, mtime) sessions into their bundles
+
+        A source is deleted only once its bundle has been closed and synced
+        and the member's size matches; a session written to meanwhile stays.
+        """
+        by_project = defaultdict(list)
+        for row in files:
+            by_project[row[2]].append(row)
+
+        totals = {"sessions": 0, "bundles": 0, "bytes_in": 0, "bytes_out": 0}
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        for project, rows in by_project.items():
+            bundle = self.bundle_path(project)
+            before = bundle.stat().st_size if bundle.exists() else 0
+            moved = []
+            with zipfile.ZipFile(
+                bundle, "a", zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL
+            ) as zf:
+                members = {info.filename: info for info in zf.infolist()}
+                for path, root, _, size, mtime in rows:
+                    try:
+                        st = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    if (st.st_size, st.st_mtime) != (size, mtime):
+                        continue  # Written to since the index saw it
+                    member = members.get(path.name)
+                    if member is None or member.file_size != size:
+                        # A session restored and archived again: zip readers
+                        # use the last member of a repeated name
+                        with warnings.catch_warnings():
+                            warnings.simplefilter("ignore", UserWarning)
+                            zf.write(path, path.name)
+                        member = zf.getinfo(path.name)
+                    if member.file_size == size:
+                        moved.append((path, root, size, mtime))
+            # The central directory is written on close; sync it before any
+            # source is deleted
+            with open(bundle, "rb") as fp:
+                os.fsync(fp.fileno())
+
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO bundled (path, root, project, bundle, "
+                    "member, size, mtime) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (str(path), root, project, str(bundle), path.name, size, mtime)
+                        for path, root, size, mtime in moved
+                    ],
+                )
+            for path, _, size, _ in moved:
+                path.unlink(missing_ok=True)
+                totals["bytes_in"] += size
+            if not moved:
+                if not before:
+                    bundle.unlink(missing_ok=True)  # Opened for nothing
+                continue
+            totals["sessions"] += len(moved)
+            totals["bundles"] += 1
+            totals["bytes_out"] += bundle.stat().st_size - before
+        return totals
+
+    def members(
+        self, projects: Optional[List[str]] = None
+    ) -> List[Tuple[Path, str, int, float]]:
+        """(original path, project, size, mtime) of bundled sessions"""
+        sql = "SELECT path, project, size, mtime FROM bundled"
+        args = []
+        if self.roots is not None:
+            sql += f" WHERE root IN ({', '.join('?' * len(self.roots))})"
+            args = self.roots
+        rows = self.conn.execute(sql, args)
+        return [
+            (Path(path), project, size, mtime)
+            for path, project, size, mtime in rows
+            if projects is None or project in projects
+        ]
+
+    def find(self, stem: str) -> Optional[Path]:
+        """Original path of the bundled session with this id"""
+        for path, _, _, _ in self.members():
+            if path.stem == stem:
+                return path
+        return None
+
+    def open(self, path: Path):
+        """Binary stream of one bundled session, inflating only that member"""
+        row = self.conn.execute(
+            "SELECT bundle, member FROM bundled WHERE path = ?", (str(path),)
+        ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"{path} is not in a bundle")
+        zf = zipfile.ZipFile(row[0])
+        try:
+            stream = zf.open(row[1])
+        except KeyError:
+            zf.close()
+            raise FileNotFoundError(f"{row[1]} is missing from {row[0]}")
+        # The member stream keeps the archive open until it is closed
+        zf.close()
+        return stream
+
+    def extract(self, path: Path) -> Path:
+        """A real file with the bundled session's content and mtime"""
+        row = self.conn.execute(
+            "SELECT size, mtime, project FROM bundled WHERE path = ?", (str(path),)
+        ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"{path} is not in a bundle")
+        size, mtime, project = row
+        target = self.unbundled_dir / project / path.name
+        try:
+            st = target.stat()
+            # utime() may round the float mtime by a few nanoseconds
+            if st.st_size == size and abs(st.st_mtime - mtime) < 1e-6:
+                self._used(path)
+                return target
+        except FileNotFoundError:
+            pass
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_suffix(".tmp")
+        with self.open(path) as src, open(tmp_path, "wb") as out:
+            shutil.copyfileobj(src, out, 1 << 20)
+        os.utime(tmp_path, (mtime, mtime))
+        tmp_path.replace(target)
+        self._used(path)
+        return target
+
+    def _used(self, path: Path):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE bundled SET used = ? WHERE path = ?", (time.time(), str(path))
+            )
+
+    def prune(self, max_age: float = UNBUNDLED_SECONDS) -> List[str]:
+        """Delete extracted copies not asked for in max_age seconds; returns them
+
+        Copies of sessions that are no longer bundled go too. Every root's
+        bundles are considered, since the copies share one directory.
+        """
+        wanted = set(
+            self.conn.execute(
+                "SELECT project, member FROM bundled WHERE used >= ?",
+                (time.time() - max_age,),
+            )
+        )
+        removed = []
+        for target in self.unbundled_dir.glob("*/*.jsonl"):
+            if (target.parent.name, target.name) not in wanted:
+                target.unlink(missing_ok=True)
+                removed.append(str(target))
+        return removed
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Persistent cache of converted session Markdown with LRU eviction.
+
+Session files are append-only while a conversation is live, so each entry
+also remembers how far into its source it has rendered. When a source has
+grown and the bytes just before that offset are unchanged, only the appended
+records are rendered and spliced onto the cached Markdown.
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, TextIO, Tuple
+
+from chat_index import CACHE_DIR, boundary_hash, connect
+
+CONVERSIONS_DIR = CACHE_DIR / "conversions"
+DEFAULT_CACHE_MB = 512
+
+# render(src, out, offset) writes Markdown for src from offset on and returns
+# (end offset, lines consumed)
+Renderer = Callable[[Path, TextIO, int], Tuple[int, int]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversions (
+    key TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    offset INTEGER NOT NULL DEFAULT 0,
+    lines INTEGER NOT NULL DEFAULT 0,
+    boundary TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS conversions_by_source ON conversions (source, version);
+"""
+
+# Columns added after the table was first shipped
+MIGRATIONS = {
+    "offset": "INTEGER NOT NULL DEFAULT 0",
+    "lines": "INTEGER NOT NULL DEFAULT 0",
+    "boundary": "TEXT NOT NULL DEFAULT ''",
+}
+
+
+class ConversionCache:
+    """Converted Markdown keyed by (source path, size, mtime, converter version).
+
+    Entries live as files under CONVERSIONS_DIR; the SQLite table tracks their
+    size and last use so the total can be held under max_bytes.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_CACHE_MB * 1024 * 1024,
+        conn: sqlite3.Connection = None,
+        root: Path = CONVERSIONS_DIR,
+    ):
+        self.max_bytes = max_bytes
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.conn = conn or connect(check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        columns = {
+            row[1] for row in self.conn.execute("PRAGMA table_info(conversions)")
+        }
+        for column, decl in MIGRATIONS.items():
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE conversions ADD COLUMN {column} {decl}")
+        self.lock = threading.Lock()
+
+    def key(self, src: Path, size: int, mtime_ns: int, version: str) -> str:
+        """Content address of one conversion"""
+        ident = f"{src.resolve()}\0{size}\0{mtime_ns}\0{version}"
+        return hashlib.sha256(ident.encode()).hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.root / f"{key}.md"
+
+    def lookup(self, src: Path, version: str) -> Optional[Path]:
+        """Return the cached Markdown for src if it is still current"""
+        st = src.stat()
+        key = self.key(src, st.st_size, st.st_mtime_ns, version)
+        path = self.entry_path(key)
+
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT 1 FROM conversions WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            if not path.exists():
+                self.conn.execute("DELETE FROM conversions WHERE key = ?", (key,))
+                return None
+            self.conn.execute(
+                "UPDATE conversions SET last_used = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        return path
+
+    def store(self, src: Path, version: str, render: Renderer) -> Path:
+        """Render src into a new cache entry, superseding older ones for src"""
+        st = src.stat()
+        key = self.key(src, st.st_size, st.st_mtime_ns, version)
+        path = self.entry_path(key)
+
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as out:
+                offset, lines = render(src, out, 0)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        self._record(src, st, version, key, offset, lines)
+        return path
+
+    def extend(self, src: Path, version: str, render: Renderer) -> Optional[Path]:
+        """Render only what was appended to src since its cached entry.
+
+        Returns None when there is no entry to extend or the source no longer
+        starts with the bytes that were rendered, in which case the caller
+        should fall back to store().
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT key, offset, lines, boundary FROM conversions "
+                "WHERE source = ? AND version = ? ORDER BY last_used DESC LIMIT 1",
+                (str(src.resolve()), version),
+            ).fetchone()
+        if not row:
+            return None
+
+        old_key, old_offset, old_lines, boundary = row
+        old_path = self.entry_path(old_key)
+        st = src.stat()
+        if (
+            old_offset == 0
+            or st.st_size < old_offset
+            or not old_path.exists()
+            or boundary_hash(src, old_offset) != boundary
+        ):
+            return None
+
+        key = self.key(src, st.st_size, st.st_mtime_ns, version)
+        path = self.entry_path(key)
+        # Copy on write: another process may be reading the old entry, which
+        # stays in place until evict() removes it
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            try:
+                shutil.copyfile(old_path, tmp_path)
+            except FileNotFoundError:
+                return None  # Evicted since the check above
+            with open(tmp_path, "a", encoding="utf-8") as out:
+                offset, lines = render(src, out, old_offset)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        self._record(src, st, version, key, offset, old_lines + lines)
+        return path
+
+    def _record(self, src: Path, st, version: str, key: str, offset: int, lines: int):
+        """Register an entry and mark older ones for the same source superseded
+
+        Superseded entries are only deleted by evict(), so a path handed out
+        by lookup() stays readable for the rest of the run that asked.
+        """
+        source = str(src.resolve())
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE conversions SET last_used = 0 WHERE source = ? "
+                "AND version = ? AND key != ?",
+                (source, version, key),
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO conversions "
+                "(key, source, size, mtime_ns, version, bytes, last_used, "
+                "offset, lines, boundary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    source,
+                    st.st_size,
+                    st.st_mtime_ns,
+                    version,
+                    self.entry_path(key).stat().st_size,
+                    time.time(),
+                    offset,
+                    lines,
+                    boundary_hash(src, offset),
+                ),
+            )
+
+    def evict(self) -> int:
+        """Drop superseded entries, then the least recently used over max_bytes"""
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT key, bytes, last_used FROM conversions ORDER BY last_used DESC"
+            ).fetchall()
+            total = 0
+            doomed = []
+            for key, size, last_used in rows:
+                if not last_used:
+                    doomed.append(key)
+                    continue
+                total += size
+                if total > self.max_bytes:
+                    doomed.append(key)
+            self._drop(doomed)
+        return len(doomed)
+
+    def _drop(self, keys):
+        for key in keys:
+            self.entry_path(key).unlink(missing_ok=True)
+            self.conn.execute("DELETE FROM conversions WHERE key = ?", (key,))
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Streaming converter from Claude session .jsonl files to Markdown."""
+
+import json
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional, TextIO, Tuple
+
+# Bump whenever the rendered Markdown changes so cached output is rebuilt
+CONVERTER_VERSION = 1
+
+ROLE_HEADERS = {"user": "👤 User", "assistant": "🤖 Assistant"}
+
+
+def parse_line(line) -> Optional[Dict]:
+    """Parse one .jsonl line (str or bytes), or None if blank or truncated"""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def iter_records(fp) -> Iterator[Dict]:
+    """Yield one parsed record per line, skipping blank or truncated lines"""
+    for line in fp:
+        record = parse_line(line)
+        if record is not None:
+            yield record
+
+
+def fence(text: str, lang: str = "") -> str:
+    """Wrap text in a code fence longer than any backtick run it contains"""
+    longest = run = 0
+    for char in text:
+        run = run + 1 if char == "`" else 0
+        longest = max(longest, run)
+    ticks = "`" * max(3, longest + 1)
+    return f"{ticks}{lang}\n{text}\n{ticks}"
+
+
+def tool_result_text(content) -> str:
+    """Flatten tool_result content (string or list of blocks) to text"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, dict) and block.get("type") == "text":
+                parts.append(block.get("text", ""))
+            elif isinstance(block, dict):
+                parts.append(f"[{block.get('type', 'block')}]")
+        return "\n".join(parts)
+    return ""
+
+
+def render_block(block: Dict, elider=None) -> str:
+    """Render one message content block, eliding tool results if an Elider is given"""
+    kind = block.get("type")
+    if kind == "text":
+        return block.get("text", "")
+    if kind == "thinking":
+        thinking = block.get("thinking", "")
+        return f"<details><summary>Thinking</summary>\n\n{thinking}\n\n</details>"
+    if kind == "tool_use":
+        if elider:
+            elider.note_call(block)
+        payload = json.dumps(block.get("input", {}), indent=2, ensure_ascii=False)
+        return (
+            f"**Tool call: {block.get('name', 'unknown')}**\n\n{fence(payload, 'json')}"
+        )
+    if kind == "tool_result":
+        label = "Tool error" if block.get("is_error") else "Tool result"
+        text = tool_result_text(block.get("content"))
+        if elider:
+            text = elider.apply(block.get("tool_use_id", ""), text)
+        return f"**{label}**\n\n{fence(text)}"
+    if kind == "image":
+        return "[image]"
+    return ""
+
+
+def render_record(record: Dict, elider=None) -> str:
+    """Render a session record as a Markdown section, or '' to skip it"""
+    kind = record.get("type")
+    if kind == "summary":
+        return f"> **Summary:** {record.get('summary', '')}\n\n"
+    if kind not in ROLE_HEADERS:
+        return ""
+
+    message = record.get("message") or {}
+    content = message.get("content")
+    if isinstance(content, str):
+        body = content
+    elif isinstance(content, list):
+        body = "\n\n".join(
+            part
+            for part in (
+                render_block(b, elider) for b in content if isinstance(b, dict)
+            )
+            if part
+        )
+    else:
+        body = ""
+    if not body.strip():
+        return ""
+
+    header = f"## {ROLE_HEADERS[kind]}"
+    if record.get("isSidechain"):
+        header += " (sub-agent)"
+    if record.get("timestamp"):
+        header += f" · {record['timestamp']}"
+    return f"{header}\n\n{body}\n\n"
+
+
+def read_complete(src: BinaryIO) -> Iterator[Tuple[int, Optional[Dict]]]:
+    """Yield (line bytes, record or None) for each complete line of src
+
+    Stops before a trailing line that Claude is still writing, so callers can
+    resume from the bytes consumed so far on a later run.
+    """
+    for raw in src:
+        record = parse_line(raw)
+        if not raw.endswith(b"\n") and record is None:
+            return
+        yield len(raw), record
+
+
+def record_text(record: Dict) -> str:
+    """Plain searchable text of a record: messages, tool input and results"""
+    if record.get("type") == "summary":
+        return record.get("summary", "")
+    content = (record.get("message") or {}).get("content")
+    if isinstance(content, str):
+        return content
+    if not isinstance(content, list):
+        return ""
+
+    parts = []
+    for block in content:
+        if not isinstance(block, dict):
+            continue
+        kind = block.get("type")
+        if kind == "text":
+            parts.append(block.get("text", ""))
+        elif kind == "tool_use":
+            parts.append(json.dumps(block.get("input", {}), ensure_ascii=False))
+        elif kind == "tool_result":
+            parts.append(tool_result_text(block.get("content")))
+    return "\n".join(parts)
+
+
+def convert_stream(src: BinaryIO, out: TextIO, elider=None) -> Tuple[int, int]:
+    """Render complete records from src into out; returns (bytes, lines) consumed"""
+    consumed = lines = 0
+    for length, record in read_complete(src):
+        consumed += length
+        lines += 1
+        if record is not None:
+            section = render_record(record, elider)
+            if section:
+                out.write(section)
+    return consumed, lines
+
+
+def convert_session(
+    src: Path, out: TextIO, offset: int = 0, elider=None
+) -> Tuple[int, int]:
+    """Write the Markdown for src from byte offset on; returns (end offset, lines)"""
+    if offset == 0:
+        out.write(f"# Claude session {src.stem}\n\n")
+    with open(src, "rb") as fp:
+        fp.seek(offset)
+        consumed, lines = convert_stream(fp, out, elider)
+    return offset + consumed, lines
+
+
+def convert_file(src: Path, output_dir: Path) -> Path:
+    """Convert src into output_dir/<stem>.md and return the written path"""
+    output_path = output_dir / f"{src.stem}.md"
+    with open(output_path, "w", encoding="utf-8") as out:
+        convert_session(src, out)
+    return output_path
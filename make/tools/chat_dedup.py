@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Cross-session deduplication of large fenced blocks in exported Markdown."""
+
+import hashlib
+from typing import Callable, Dict, List, TextIO
+
+DEFAULT_MIN_BYTES = 2048
+
+
+def marker(digest: str) -> str:
+    """Line written before the first copy of a block"""
+    return f"<!-- block:{digest} -->\n"
+
+
+def reference(digest: str, size: int, first: str) -> str:
+    """Line that replaces a later copy of a block first shown in session first"""
+    return f"[Duplicate of block:{digest} ({size / 1024:.1f} KB), first shown in {first}]\n"
+
+
+class BlockDeduplicator:
+    """Text sink that collapses repeats of large fenced blocks.
+
+    Tool results and file reads are rendered as fenced code blocks. The first
+    copy of each block of at least min_bytes is written with a short marker;
+    later copies anywhere in the archive become a one-line reference to it.
+    Only the block currently being read is held in memory.
+    """
+
+    def __init__(self, out: TextIO, min_bytes: int = DEFAULT_MIN_BYTES):
+        self.out = out
+        self.min_bytes = min_bytes
+        self.session = ""
+        self.seen: Dict[str, str] = {}
+        self.duplicates = 0
+        self.saved_bytes = 0
+        # Pieces of the current partial line, joined once it is complete
+        self.pending: List[str] = []
+        self.fence = None
+        self.block: List[str] = []
+
+    def begin(self, session: str):
+        """Flush the previous session and attribute new blocks to this one"""
+        self.flush()
+        self.session = session
+
+    def write(self, text: str) -> int:
+        if "\n" not in text:
+            self.pending.append(text)
+            return len(text)
+        first, *lines, rest = text.split("\n")
+        self.pending.append(first)
+        self._line("".join(self.pending) + "\n")
+        for line in lines:
+            self._line(line + "\n")
+        self.pending = [rest] if rest else []
+        return len(text)
+
+    def flush(self):
+        """Emit any partial line or unterminated block as-is"""
+        if self.pending:
+            self._line("".join(self.pending))
+            self.pending = []
+        if self.block:
+            self.out.writelines(self.block)
+            self.block = []
+            self.fence = None
+
+    def _line(self, line: str):
+        stripped = line.strip()
+        if self.fence is None:
+            if stripped.startswith("```"):
+                self.fence = "`" * (len(stripped) - len(stripped.lstrip("`")))
+                self.block = [line]
+            else:
+                self.out.write(line)
+            return
+
+        self.block.append(line)
+        if stripped.startswith(self.fence) and not stripped.strip("`"):
+            self._finish_block()
+
+    def _finish_block(self):
+        text = "".join(self.block)
+        self.block = []
+        self.fence = None
+
+        size = len(text.encode("utf-8"))
+        if size < self.min_bytes:
+            self.out.write(text)
+            return
+
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        if digest not in self.seen:
+            self.seen[digest] = self.session
+            self.out.write(marker(digest) + text)
+            return
+
+        line = reference(digest, size, self.seen[digest])
+        self.out.write(line)
+        self.duplicates += 1
+        self.saved_bytes += size - len(line)
+
+
+class _Discard:
+    def write(self, text: str) -> int:
+        return len(text)
+
+    def writelines(self, lines):
+        pass
+
+
+class BlockCounter(BlockDeduplicator):
+    """Measures what deduplication can add to text, without writing it
+
+    Every block of at least min_bytes is charged its marker, plus however
+    much a reference naming session first would be longer than the block.
+    cost prices a string in the caller's unit.
+    """
+
+    def __init__(self, min_bytes: int, first: str, cost: Callable[[str], int]):
+        super().__init__(_Discard(), min_bytes)
+        self.first = first
+        self.cost = cost
+        self.charge = 0
+
+    def _finish_block(self):
+        text = "".join(self.block)
+        self.block = []
+        self.fence = None
+
+        size = len(text.encode("utf-8"))
+        if size < self.min_bytes:
+            return
+        digest = "0" * 12
+        longer = self.cost(reference(digest, size, self.first)) - self.cost(text)
+        self.charge += self.cost(marker(digest)) + max(0, longer)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Policy-driven elision of large tool results while sessions are rendered.
+
+A policy maps tool names (exact or glob, e.g. "mcp__*") to a rule; "default"
+covers every other tool. Results no larger than max_bytes are kept whole.
+Larger ones are cut according to mode:
+
+    truncate   keep the first head_lines lines
+    head_tail  keep the first head_lines and the last tail_lines lines
+    summarize  keep only a one-line description (JSON shape or first line)
+
+Example policy file (--elide-policy):
+
+    {"default": {"mode": "head_tail", "max_bytes": 8192},
+     "tools": {"Bash": {"mode": "head_tail", "head_lines": 10, "tail_lines": 80},
+               "mcp__*": {"mode": "summarize", "max_bytes": 2048}}}
+
+Every cut is replaced by a note saying which lines or characters were
+removed, how many bytes that was and the SHA-256 of the full result.
+"""
+
+import fnmatch
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+MODES = ("truncate", "head_tail", "summarize")
+RULE_DEFAULTS = {
+    "mode": "head_tail",
+    "max_bytes": 8192,
+    "head_lines": 60,
+    "tail_lines": 20,
+}
+
+DEFAULT_POLICY = {
+    "default": {},
+    "tools": {
+        "Read": {"head_lines": 80, "tail_lines": 20},
+        "Bash": {"head_lines": 20, "tail_lines": 60},
+        "Grep": {"mode": "truncate", "head_lines": 100},
+        "Glob": {"mode": "truncate", "head_lines": 100},
+        "WebFetch": {"mode": "truncate", "head_lines": 80},
+    },
+}
+
+
+def format_bytes(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+class ElisionPolicy:
+    """Validated per-tool rules plus running totals across sessions"""
+
+    def __init__(self, config: Dict):
+        self.default = self._rule(config.get("default") or {}, "default")
+        self.tools = {
+            name: self._rule(rule, name)
+            for name, rule in (config.get("tools") or {}).items()
+        }
+        canonical = json.dumps(
+            {"default": self.default, "tools": self.tools}, sort_keys=True
+        )
+        self.digest = hashlib.sha256(canonical.encode()).hexdigest()[:12]
+        self.lock = threading.Lock()
+        self.elided = 0
+        self.saved_bytes = 0
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "ElisionPolicy":
+        """The policy in a JSON file, or the built-in one"""
+        if path is None:
+            return cls(DEFAULT_POLICY)
+        try:
+            config = json.loads(path.read_text())
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Cannot read elision policy {path}: {e}")
+        if not isinstance(config, dict):
+            raise ValueError(f"Elision policy {path} must be a JSON object")
+        return cls(config)
+
+    @staticmethod
+    def _rule(rule: Dict, name: str) -> Dict:
+        merged = dict(RULE_DEFAULTS, **rule)
+        if merged["mode"] not in MODES:
+            raise ValueError(f"Elision rule '{name}': mode must be one of {MODES}")
+        for key in ("max_bytes", "head_lines", "tail_lines"):
+            if not isinstance(merged[key], int) or merged[key] < 0:
+                raise ValueError(f"Elision rule '{name}': {key} must be >= 0")
+        return merged
+
+    def rule(self, tool: str) -> Dict:
+        if tool in self.tools:
+            return self.tools[tool]
+        for pattern, rule in self.tools.items():
+            if fnmatch.fnmatchcase(tool, pattern):
+                return rule
+        return self.default
+
+    def session(self) -> "Elider":
+        return Elider(self)
+
+    def count(self, saved: int, elided: int = 1):
+        with self.lock:
+            self.elided += elided
+            self.saved_bytes += saved
+
+
+class Elider:
+    """Applies a policy within one session, tracking which tool made each call"""
+
+    def __init__(self, policy: ElisionPolicy):
+        self.policy = policy
+        self.tools: Dict[str, str] = {}
+
+    def note_call(self, block: Dict):
+        """Remember the tool name of a tool_use block for its result"""
+        self.tools[block.get("id", "")] = block.get("name", "unknown")
+
+    def apply(self, tool_use_id: str, text: str) -> str:
+        """text unchanged, or cut down by the rule for the tool that made it"""
+        size = len(text.encode("utf-8"))
+        tool = self.tools.pop(tool_use_id, "unknown")
+        rule = self.policy.rule(tool)
+        if size <= rule["max_bytes"]:
+            return text
+
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        origin = f"this {tool} result by its {rule['mode']} rule; sha256 {digest}"
+        if rule["mode"] == "summarize":
+            summary = f"{describe(text)}, {format_bytes(size)}"
+            kept = f"[✂ Summarized {summary}, from {origin}]"
+        else:
+            head = rule["head_lines"]
+            tail = rule["tail_lines"] if rule["mode"] == "head_tail" else 0
+            kept = self._sample(text, head, tail, rule["max_bytes"], origin)
+        if kept is None:
+            return text
+        self.policy.count(size - len(kept.encode("utf-8")))
+        return kept
+
+    @staticmethod
+    def _sample(text: str, head: int, tail: int, max_bytes: int, origin: str):
+        lines = text.split("\n")
+        if len(lines) > head + tail:
+            cut = lines[head : len(lines) - tail]
+            removed = len("\n".join(cut).encode("utf-8"))
+            note = (
+                f"[✂ Elided lines {head + 1}-{len(lines) - tail} of {len(lines)} "
+                f"({format_bytes(removed)}) from {origin}]"
+            )
+            kept = lines[:head] + [note] + (lines[len(lines) - tail :] if tail else [])
+            return "\n".join(kept)
+
+        # Few but very long lines (minified JSON, base64): cut characters instead
+        keep_head = max_bytes if not tail else max_bytes * 2 // 3
+        keep_tail = 0 if not tail else max_bytes - keep_head
+        if len(text) <= keep_head + keep_tail:
+            return None
+        end = len(text) - keep_tail
+        removed = len(text[keep_head:end].encode("utf-8"))
+        note = (
+            f"\n[✂ Elided characters {keep_head + 1}-{end} of {len(text)} "
+            f"({format_bytes(removed)}) from {origin}]\n"
+        )
+        return text[:keep_head] + note + text[end:]
+
+
+def describe(text: str) -> str:
+    """One-line shape of a tool result: JSON structure or its first line"""
+    try:
+        value = json.loads(text)
+    except ValueError:
+        value = None
+    if isinstance(value, dict):
+        keys = list(value)
+        shown = ", ".join(keys[:8]) + (", …" if len(keys) > 8 else "")
+        return f"JSON object with {len(keys)} keys ({shown})"
+    if isinstance(value, list):
+        return f"JSON array of {len(value)} items"
+    lines = text.split("\n")
+    first = next((line.strip() for line in lines if line.strip()), "")
+    if len(first) > 120:
+        first = first[:117] + "..."
+    return f"{len(lines)} lines starting {first!r}"
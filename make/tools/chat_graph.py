@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Parent-pointer index of session records for exporting single threads."""
+
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Set, TextIO, Tuple
+
+from chat_converter import read_complete, render_record
+
+THREADS = ("all", "main", "sidechains")
+
+
+class SessionGraph:
+    """Compact parent-pointer index over the lines of one session.
+
+    Built in one streaming pass: per line it keeps the parent's line number
+    (-1 for roots and lines without a uuid), the uuid and two flags: sub-agent
+    record and tool result. Record bodies are not kept. After /compact the
+    chain restarts with a null parentUuid, so logicalParentUuid is followed
+    across the boundary.
+
+    Parallel tool calls are logged as a chain of assistant records, with
+    each result hanging off its call as a side branch; such results belong
+    to the thread of their call.
+    """
+
+    def __init__(self):
+        self.lines: Dict[str, int] = {}
+        self.uuids: List[str] = []
+        self.parents = array("i")
+        self.sidechain = bytearray()
+        self.results = bytearray()
+
+    @classmethod
+    def build(cls, src: Path) -> "SessionGraph":
+        graph = cls()
+        with open(src, "rb") as fp:
+            for _, record in read_complete(fp):
+                graph.add(record or {})
+        return graph
+
+    def add(self, record: Dict):
+        uuid = record.get("uuid") or ""
+        parent = record.get("parentUuid") or record.get("logicalParentUuid")
+        # Parents are always written before their children
+        self.parents.append(self.lines.get(parent, -1) if parent else -1)
+        self.sidechain.append(bool(record.get("isSidechain")))
+        content = (record.get("message") or {}).get("content")
+        self.results.append(
+            isinstance(content, list)
+            and bool(content)
+            and all(
+                isinstance(b, dict) and b.get("type") == "tool_result" for b in content
+            )
+        )
+        self.uuids.append(uuid)
+        if uuid:
+            self.lines[uuid] = len(self.uuids) - 1
+
+    def __len__(self) -> int:
+        return len(self.uuids)
+
+    def path_to(self, line: int) -> Set[int]:
+        """Line numbers from the root of line's thread down to line"""
+        path = set()
+        while line >= 0 and line not in path:
+            path.add(line)
+            line = self.parents[line]
+        return path
+
+    def thread(self, leaf: int) -> Set[int]:
+        """The path to leaf plus the tool results answering calls on it"""
+        path = self.path_to(leaf)
+        return path | {
+            i for i, flag in enumerate(self.results) if flag and self.parents[i] in path
+        }
+
+    def leaves(self) -> List[int]:
+        """Tips of branches: records no other record continues from
+
+        A tool result is a tip only when its call has no other continuation;
+        results hanging off a chain of parallel calls are side branches. The
+        main thread's tip is always included.
+        """
+        has_child = set(self.parents)
+        continued = {
+            parent for i, parent in enumerate(self.parents) if not self.results[i]
+        }
+        tips = [
+            i
+            for i, uuid in enumerate(self.uuids)
+            if uuid
+            and i not in has_child
+            and not (self.results[i] and self.parents[i] in continued)
+        ]
+        main = self.main_leaf()
+        if main >= 0 and main not in tips:
+            tips = sorted(tips + [main])
+        return tips
+
+    def main_leaf(self) -> int:
+        """The newest main-thread record, the tip of the live conversation"""
+        for i in range(len(self) - 1, -1, -1):
+            if self.uuids[i] and not self.sidechain[i]:
+                return i
+        return -1
+
+    def find(self, prefix: str) -> int:
+        """Line of the record whose uuid starts with prefix"""
+        matches = [i for i, uuid in enumerate(self.uuids) if uuid.startswith(prefix)]
+        if len(matches) != 1:
+            found = "no record" if not matches else f"{len(matches)} records"
+            raise ValueError(f"Branch '{prefix}' matches {found}")
+        return matches[0]
+
+    def select(self, thread: str) -> Optional[Set[int]]:
+        """Lines to export for "all" (None), "main", "sidechains" or a uuid
+
+        A uuid (or unique prefix) selects the branch from the root to that
+        record. The main thread keeps summaries, which have no uuid.
+        """
+        if thread == "all":
+            return None
+        if thread == "sidechains":
+            return {i for i, flag in enumerate(self.sidechain) if flag}
+        if thread == "main":
+            unthreaded = {
+                i
+                for i, uuid in enumerate(self.uuids)
+                if not uuid and not self.sidechain[i]
+            }
+            return self.thread(self.main_leaf()) | unthreaded
+        return self.thread(self.find(thread))
+
+
+def convert_thread(src: Path, out: TextIO, thread: str, elider=None) -> Tuple[int, int]:
+    """Write the Markdown for one thread of src; returns (bytes, lines) read"""
+    keep = SessionGraph.build(src).select(thread)
+    out.write(f"# Claude session {src.stem}\n\n")
+    if thread != "all":
+        out.write(f"_Thread: {thread}_\n\n")
+    consumed = lines = 0
+    with open(src, "rb") as fp:
+        for length, record in read_complete(fp):
+            if record is not None and (keep is None or lines in keep):
+                section = render_record(record, elider)
+                if section:
+                    out.write(section)
+            consumed += length
+            lines += 1
+    return consumed, lines
@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+"""Persistent manifest of Claude session files for fast project discovery."""
+
+import contextlib
+import fnmatch
+import hashlib
+import os
+import re
+import sqlite3
+from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote
+
+CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    / "claude-chat-analyzer"
+)
+INDEX_DB = CACHE_DIR / "index.sqlite3"
+BOUNDARY_BYTES = 4096
+# Threads stat'ing project directories during a refresh
+SCAN_WORKERS = 16
+# Longest an update holds the write lock that a manifest refresh also needs
+COMMIT_SECONDS = 0.2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    root TEXT NOT NULL,
+    project TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (root, project)
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    project TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_by_project ON files (root, project);
+CREATE TABLE IF NOT EXISTS bundled (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    project TEXT NOT NULL,
+    bundle TEXT NOT NULL,
+    member TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS digests (
+    path TEXT NOT NULL,
+    nbytes INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (path, nbytes)
+);
+"""
+
+
+def connect(db_path: Path = INDEX_DB, **kwargs) -> sqlite3.Connection:
+    """Open the analyzer cache database, falling back to memory if unwritable"""
+    try:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(db_path, **kwargs)
+        conn.execute("PRAGMA journal_mode=WAL")
+    except (OSError, sqlite3.Error):
+        conn = sqlite3.connect(":memory:", **kwargs)
+    return conn
+
+
+def in_memory(conn: sqlite3.Connection) -> bool:
+    """Whether connect() fell back to memory, which no other connection shares"""
+    return not conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def add_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]):
+    """Add the columns of table that were introduced after it first shipped"""
+    present = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for column, decl in columns.items():
+        if column not in present:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def root_of(path: Path) -> str:
+    """The projects root a session file lives under, as stored in the manifest"""
+    return str(path.parent.parent)
+
+
+def add_root_column(conn: sqlite3.Connection, table: str):
+    """Key a per-session table by root too, filling it in for existing rows"""
+    add_columns(conn, table, {"root": "TEXT NOT NULL DEFAULT ''"})
+    rows = conn.execute(f"SELECT path FROM {table} WHERE root = ''").fetchall()
+    with conn:
+        conn.executemany(
+            f"UPDATE {table} SET root = ? WHERE path = ?",
+            [(root_of(Path(path)), path) for (path,) in rows],
+        )
+
+
+def dir_mtime_ns(entry: os.DirEntry) -> Optional[int]:
+    try:
+        return entry.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def list_sessions(path: str) -> Optional[List[Tuple[str, int, float]]]:
+    """(path, size, mtime) of the .jsonl files in a project directory
+
+    scandir's d_type answers is_file() without a stat on most filesystems,
+    so only the sessions themselves are stat'ed.
+    """
+    rows = []
+    try:
+        for entry in os.scandir(path):
+            if not entry.name.endswith(".jsonl") or not entry.is_file():
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            rows.append((entry.path, st.st_size, st.st_mtime))
+    except FileNotFoundError:
+        return None
+    return rows
+
+
+def stat_file(path: str) -> Optional[Tuple[int, float]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime
+
+
+def boundary_hash(src: Path, offset: int) -> str:
+    """Checksum of the bytes just before offset, used to verify a prefix"""
+    start = max(0, offset - BOUNDARY_BYTES)
+    with open(src, "rb") as fp:
+        fp.seek(start)
+        data = fp.read(offset - start)
+    return hashlib.sha256(data).hexdigest()
+
+
+def prefix_digest(src: Path, nbytes: int) -> str:
+    """Checksum of the first nbytes of a file"""
+    digest = hashlib.sha256()
+    with open(src, "rb") as fp:
+        while nbytes > 0:
+            chunk = fp.read(min(nbytes, 1 << 20))
+            if not chunk:
+                break
+            digest.update(chunk)
+            nbytes -= len(chunk)
+    return digest.hexdigest()
+
+
+def resume_point(path: Path, size: int, offset: int, boundary: str) -> Optional[int]:
+    """Where to resume reading an append-only session processed up to offset
+
+    Returns None when nothing was appended, 0 when the file shrank or was
+    rewritten and must be read from the start, and offset otherwise.
+    """
+    if size < offset:
+        # The manifest lags behind a session appended to since the refresh
+        size = path.stat().st_size
+    if size == offset:
+        return None
+    if size < offset or boundary_hash(path, offset) != boundary:
+        return 0
+    return offset
+
+
+class SessionIndex:
+    """Manifest of .jsonl session files keyed by path, size and mtime.
+
+    Only project directories whose mtime changed since the last refresh are
+    listed again; that is how new and deleted sessions are found. Appending
+    to a session does not touch the directory mtime, and any session can be
+    resumed, so every known file of an unchanged project is re-stat'ed. A
+    stat is far cheaper than the open that a stale size would cost later.
+    """
+
+    def __init__(
+        self,
+        projects_dir: Path,
+        conn: sqlite3.Connection = None,
+        workers: int = SCAN_WORKERS,
+    ):
+        self.projects_dir = projects_dir
+        self.root = str(projects_dir)
+        self.workers = workers
+        self.conn = conn or connect()
+        self.conn.executescript(SCHEMA)
+        # Paths the manifest has forgotten since MergedIndex last collected them
+        self.dropped: List[str] = []
+
+    def refresh(self, full: bool = False):
+        """Bring the manifest in line with the projects directory
+
+        Every stat is a round trip on network home directories, so the
+        project directories, their listings and the known sessions are
+        stat'ed on a pool of self.workers threads; the database is only
+        written from this thread.
+        """
+        known = dict(
+            self.conn.execute(
+                "SELECT project, mtime_ns FROM dirs WHERE root = ?", (self.root,)
+            )
+        )
+
+        try:
+            entries = [e for e in os.scandir(self.projects_dir) if e.is_dir()]
+        except FileNotFoundError:
+            entries = []
+
+        with contextlib.ExitStack() as stack:
+            map_ = map
+            if self.workers > 1 and len(entries) > 1:
+                pool = stack.enter_context(ThreadPoolExecutor(self.workers))
+                map_ = pool.map
+
+            mtimes = dict(zip(entries, map_(dir_mtime_ns, entries)))
+            entries = [e for e in entries if mtimes[e] is not None]
+            stale = [e for e in entries if full or known.get(e.name) != mtimes[e]]
+            unchanged = [
+                e.name for e in entries if not full and known.get(e.name) == mtimes[e]
+            ]
+            listings = list(map_(list_sessions, [e.path for e in stale]))
+            known_files = self._known_files(unchanged)
+            stats = list(map_(stat_file, [path for path, _, _ in known_files]))
+
+        with self.conn:
+            for entry, rows in zip(stale, listings):
+                if rows is None:
+                    continue  # Removed while being listed
+                listed = {path for path, *_ in rows}
+                self.dropped += [
+                    path
+                    for path, *_ in self._known_files([entry.name])
+                    if path not in listed
+                ]
+                self.conn.execute(
+                    "DELETE FROM files WHERE root = ? AND project = ?",
+                    (self.root, entry.name),
+                )
+                self.conn.executemany(
+                    "INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+                    [(path, self.root, entry.name, *rest) for path, *rest in rows],
+                )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)",
+                    (self.root, entry.name, mtimes[entry]),
+                )
+
+            for (path, size, mtime), st in zip(known_files, stats):
+                if st is None:
+                    self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                    self.dropped.append(path)
+                elif st != (size, mtime):
+                    self.conn.execute(
+                        "UPDATE files SET size = ?, mtime = ? WHERE path = ?",
+                        (*st, path),
+                    )
+
+            for project in set(known) - {e.name for e in entries}:
+                self._forget_project(project)
+
+    def _known_files(self, projects: List[str]) -> List[Tuple[str, int, float]]:
+        """(path, size, mtime) of every known file of these projects"""
+        known = []
+        for project in projects:
+            known += self.conn.execute(
+                "SELECT path, size, mtime FROM files WHERE root = ? AND project = ?",
+                (self.root, project),
+            ).fetchall()
+        return known
+
+    def update_files(self, paths):
+        """Re-stat specific session files reported changed by a watcher"""
+        with self.conn:
+            for path in paths:
+                path = Path(path)
+                if path.suffix != ".jsonl" or path.parent.parent != self.projects_dir:
+                    continue
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    deleted = self.conn.execute(
+                        "DELETE FROM files WHERE path = ?", (str(path),)
+                    )
+                    if deleted.rowcount:
+                        self.dropped.append(str(path))
+                    continue
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                    (str(path), self.root, path.parent.name, st.st_size, st.st_mtime),
+                )
+
+    def _forget_project(self, project: str):
+        """Drop a project directory that no longer exists"""
+        self.dropped += [path for path, _, _ in self._known_files([project])]
+        self.conn.execute(
+            "DELETE FROM dirs WHERE root = ? AND project = ?", (self.root, project)
+        )
+        self.conn.execute(
+            "DELETE FROM files WHERE root = ? AND project = ?", (self.root, project)
+        )
+
+    def projects(self) -> List[Dict]:
+        """Per-project file count, total size and latest mtime"""
+        rows = self.conn.execute(
+            "SELECT project, COUNT(*), SUM(size), MAX(mtime) FROM files "
+            "WHERE root = ? GROUP BY project",
+            (self.root,),
+        )
+        return [
+            {"path": project, "files": count, "size": size, "latest_mtime": latest}
+            for project, count, size, latest in rows
+        ]
+
+    def files(self, project: str) -> List[Tuple[Path, int, float]]:
+        """(path, size, mtime) for every session file of a project"""
+        rows = self.conn.execute(
+            "SELECT path, size, mtime FROM files WHERE root = ? AND project = ?",
+            (self.root, project),
+        )
+        return [(Path(path), size, mtime) for path, size, mtime in rows]
+
+    def all_files(self) -> List[Tuple[Path, str, int, float]]:
+        """(path, project, size, mtime) for every known session file"""
+        rows = self.conn.execute(
+            "SELECT path, project, size, mtime FROM files WHERE root = ?",
+            (self.root,),
+        )
+        return [
+            (Path(path), project, size, mtime) for path, project, size, mtime in rows
+        ]
+
+    def archived(self) -> Set[str]:
+        """Original paths of sessions moved into bundles (see chat_bundle)"""
+        rows = self.conn.execute(
+            "SELECT path FROM bundled WHERE root = ?", (self.root,)
+        )
+        return {path for (path,) in rows}
+
+
+class MergedIndex:
+    """One SessionIndex per projects root, read as a single manifest.
+
+    Roots are trees rsync'ed from different machines. A session keeps its
+    file name (the session id) wherever it is copied, so only files sharing
+    a name across roots are compared. A copy whose content equals, or is a
+    prefix of, the largest copy is a duplicate: syncing a live session
+    leaves such stale prefixes behind. Duplicates are hidden from
+    projects(), files() and all_files(), so reports and exports read and
+    count each session once. Digests are cached per path and mtime.
+
+    on_drop is called with the paths of sessions the manifest forgot, once
+    per refresh, so caches kept per session elsewhere can follow.
+    """
+
+    def __init__(
+        self,
+        roots: List[Path],
+        conn: sqlite3.Connection = None,
+        workers: int = SCAN_WORKERS,
+        on_drop: Optional[Callable[[List[str]], None]] = None,
+    ):
+        self.conn = conn or connect()
+        self.on_drop = on_drop
+        self.indexes = [SessionIndex(root, self.conn, workers) for root in roots]
+        self.roots = [index.root for index in self.indexes]
+        self.conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS hidden (path TEXT PRIMARY KEY)"
+        )
+        self.duplicates = 0
+
+    def refresh(self, full: bool = False):
+        for index in self.indexes:
+            index.refresh(full)
+        self._find_duplicates()
+        self._collect_dropped()
+
+    def update_files(self, paths):
+        for index in self.indexes:
+            index.update_files(paths)
+        self._find_duplicates()
+        self._collect_dropped()
+
+    def _collect_dropped(self):
+        dropped = []
+        for index in self.indexes:
+            dropped += index.dropped
+            index.dropped = []
+        if dropped and self.on_drop:
+            self.on_drop(dropped)
+
+    def _find_duplicates(self):
+        hidden = set()
+        if len(self.indexes) > 1:
+            copies = defaultdict(list)
+            for row in self.conn.execute(
+                f"SELECT path, root, size, mtime FROM files WHERE root IN "
+                f"({', '.join('?' * len(self.roots))})",
+                self.roots,
+            ):
+                copies[Path(row[0]).name].append(row)
+            for rows in copies.values():
+                if len({root for _, root, _, _ in rows}) > 1:
+                    hidden |= self._stale_copies(rows)
+
+        with self.conn:
+            self.conn.execute("DELETE FROM hidden")
+            self.conn.executemany(
+                "INSERT INTO hidden VALUES (?)", ((p,) for p in hidden)
+            )
+            # Only a refresh that finds changes writes, so one that doesn't
+            # never waits on a search or stats update elsewhere
+            orphaned = "FROM digests WHERE path NOT IN (SELECT path FROM files)"
+            if self.conn.execute(f"SELECT 1 {orphaned} LIMIT 1").fetchone():
+                self.conn.execute(f"DELETE {orphaned}")
+        self.duplicates = len(hidden)
+
+    def _stale_copies(self, rows: List[Tuple[str, str, int, float]]) -> Set[str]:
+        """Paths of the copies that equal or are a prefix of the largest one"""
+        rows = sorted(rows, key=lambda r: (-r[2], self.roots.index(r[1])))
+        keep = rows[0]
+        stale = set()
+        for row in rows[1:]:
+            if row[1] == keep[1]:
+                continue
+            try:
+                if self._digest(row, row[2]) == self._digest(keep, row[2]):
+                    stale.add(row[0])
+            except FileNotFoundError:
+                continue
+        return stale
+
+    def _digest(self, row: Tuple[str, str, int, float], nbytes: int) -> str:
+        path, _, _, mtime = row
+        cached = self.conn.execute(
+            "SELECT digest FROM digests WHERE path = ? AND nbytes = ? AND mtime = ?",
+            (path, nbytes, mtime),
+        ).fetchone()
+        if cached:
+            return cached[0]
+        digest = prefix_digest(Path(path), nbytes)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?)",
+            (path, nbytes, mtime, digest),
+        )
+        return digest
+
+    def archived(self) -> Set[str]:
+        return set().union(*(index.archived() for index in self.indexes))
+
+    def _where(self) -> str:
+        return (
+            f"root IN ({', '.join('?' * len(self.roots))}) "
+            "AND path NOT IN (SELECT path FROM hidden)"
+        )
+
+    def projects(self) -> List[Dict]:
+        """Per-project totals over every root, each session counted once"""
+        rows = self.conn.execute(
+            "SELECT project, COUNT(*), SUM(size), MAX(mtime), COUNT(DISTINCT root) "
+            f"FROM files WHERE {self._where()} GROUP BY project",
+            self.roots,
+        )
+        projects = {
+            project: {
+                "path": project,
+                "files": count,
+                "size": size,
+                "latest_mtime": latest,
+                "roots": roots,
+                "archived": 0,
+            }
+            for project, count, size, latest, roots in rows
+        }
+        # Projects whose sessions were all bundled stay selectable
+        for project, count, latest in self.conn.execute(
+            "SELECT project, COUNT(*), MAX(mtime) FROM bundled WHERE root IN "
+            f"({', '.join('?' * len(self.roots))}) GROUP BY project",
+            self.roots,
+        ):
+            row = projects.setdefault(
+                project,
+                {
+                    "path": project,
+                    "files": 0,
+                    "size": 0,
+                    "latest_mtime": latest,
+                    "roots": 0,
+                },
+            )
+            row["archived"] = count
+        return list(projects.values())
+
+    def generation(self) -> str:
+        """Digest of the manifest that changes whenever any session does"""
+        marks = ", ".join("?" * len(self.roots))
+        state = [
+            self.conn.execute(
+                f"SELECT COUNT(*), TOTAL(size), TOTAL(mtime) FROM {table} "
+                f"WHERE root IN ({marks})",
+                self.roots,
+            ).fetchone()
+            for table in ("files", "bundled")
+        ]
+        canonical = repr((state, self.roots, self.duplicates))
+        return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+    def files(self, project: str) -> List[Tuple[Path, int, float]]:
+        rows = self.conn.execute(
+            f"SELECT path, size, mtime FROM files WHERE {self._where()} AND project = ?",
+            (*self.roots, project),
+        )
+        return [(Path(path), size, mtime) for path, size, mtime in rows]
+
+    def all_files(self) -> List[Tuple[Path, str, int, float]]:
+        rows = self.conn.execute(
+            f"SELECT path, project, size, mtime FROM files WHERE {self._where()}",
+            self.roots,
+        )
+        return [
+            (Path(path), project, size, mtime) for path, project, size, mtime in rows
+        ]
+
+
+class ManifestSnapshot:
+    """The sessions a MergedIndex lists, read once, over another connection
+
+    SearchIndex and SessionStats take one in place of the MergedIndex to
+    update on another thread: the hidden duplicates are a temporary table
+    of the index's own connection, and their tables are written over conn.
+    """
+
+    def __init__(self, sessions: MergedIndex, conn: sqlite3.Connection):
+        self.conn = conn
+        self.roots = list(sessions.roots)
+        self.files = sessions.all_files()
+        self.bundled = sessions.archived()
+
+    def all_files(self) -> List[Tuple[Path, str, int, float]]:
+        return self.files
+
+    def archived(self) -> Set[str]:
+        return self.bundled
+
+
+class ProjectRegistry:
+    """Projects from one index refresh, looked up by name or selected by pattern.
+
+    Selectors are exact names (decoded or as stored on disk), globs such as
+    "client-*", or regular expressions prefixed with "re:". Project names
+    are encoded paths, so a glob also matches from any "-" in the name.
+    """
+
+    def __init__(self, rows: List[Dict]):
+        self.rows = sorted(rows, key=lambda r: r["latest_mtime"], reverse=True)
+        self.by_name = {}
+        for row in self.rows:
+            self.by_name[row["path"]] = row
+            self.by_name[unquote(row["path"])] = row
+
+    def select(self, selectors: List[str]) -> Tuple[List[str], List[str]]:
+        """(encoded project names, selectors that matched nothing)"""
+        selected = {}
+        unmatched = []
+        for selector in selectors:
+            matches = self.match(selector)
+            if not matches:
+                unmatched.append(selector)
+            for row in matches:
+                selected.setdefault(row["path"], None)
+        return list(selected), unmatched
+
+    def match(self, selector: str) -> List[Dict]:
+        if selector in self.by_name:
+            return [self.by_name[selector]]
+        if selector.startswith("re:"):
+            try:
+                pattern = re.compile(selector[3:])
+            except re.error as e:
+                raise ValueError(f"Invalid project pattern '{selector}': {e}")
+            return [r for r in self.rows if pattern.search(unquote(r["path"]))]
+        if any(c in selector for c in "*?["):
+            patterns = (selector, f"*-{selector}")
+            return [
+                r
+                for r in self.rows
+                if any(fnmatch.fnmatchcase(unquote(r["path"]), p) for p in patterns)
+            ]
+        return []
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Streaming writer for packed Claude conversation archives."""
+
+import codecs
+import gzip
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from chat_dedup import BlockDeduplicator
+from chat_redact import SecretRedactor
+
+SEPARATOR = "=" * 64
+CHUNK_BYTES = 1 << 20
+SUFFIXES = {None: ".txt", "gzip": ".txt.gz", "zstd": ".txt.zst"}
+
+
+def open_text(path: Path, compression: Optional[str]) -> TextIO:
+    """Open path for text writing, optionally through gzip or zstd"""
+    if compression is None:
+        return open(path, "w", encoding="utf-8")
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8")
+    if compression == "zstd":
+        try:
+            from compression import zstd  # Python 3.14+
+        except ImportError:
+            try:
+                import zstandard as zstd
+            except ImportError:
+                raise RuntimeError(
+                    "zstd output needs Python 3.14+ or the zstandard package: "
+                    "uv add zstandard"
+                )
+        return zstd.open(path, "wt", encoding="utf-8")
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+TOC_END = f"\n{SEPARATOR}\nSessions\n{SEPARATOR}\n"
+
+
+def preamble(count: int, shard: Optional[Tuple[int, int]] = None) -> str:
+    """Description of the archive up to its table of contents"""
+    if shard:
+        text = (
+            f"This file is shard {shard[0]} of {shard[1]} of an export of "
+            f"Claude conversation sessions, converted to Markdown. It holds "
+            f"{count} sessions or session parts and can be read on its "
+            "own; manifest.json next to it lists every shard.\n"
+        )
+    else:
+        text = (
+            f"This file is a merged representation of {count} Claude "
+            "conversation sessions, converted to Markdown.\n"
+        )
+    text += f"Generated: {datetime.now().isoformat(timespec='seconds')}\n\n"
+    return text + f"{SEPARATOR}\nTable of Contents\n{SEPARATOR}\n"
+
+
+def toc_line(number: int, entry: Dict) -> str:
+    modified = datetime.fromtimestamp(entry["mtime"]).strftime("%Y-%m-%d %H:%M")
+    return (
+        f"{number:>4}. {entry['name']}  "
+        f"({entry['size'] / 1024:.1f} KB source, modified {modified})\n"
+    )
+
+
+def banner(name: str) -> str:
+    """Heading of one session's section"""
+    return f"\n{'=' * 16}\nFile: {name}\n{'=' * 16}\n"
+
+
+def part_note(part: Tuple[int, int]) -> str:
+    return f"[Part {part[0]} of {part[1]} of this session]\n\n"
+
+
+class ArchiveWriter:
+    """Writes sessions into one archive as they arrive.
+
+    The table of contents is built from source metadata known up front, so
+    session bodies can be streamed straight through without buffering. With
+    stream set, the archive is written to that open text stream instead of
+    output_path, which may then be None.
+    """
+
+    def __init__(
+        self,
+        output_path: Optional[Path],
+        compression: Optional[str] = None,
+        dedup_min_bytes: Optional[int] = None,
+        redactor: Optional[SecretRedactor] = None,
+        stream: Optional[TextIO] = None,
+    ):
+        self.output_path = output_path
+        self.stream = stream
+        self.compression = compression
+        self.dedup_min_bytes = dedup_min_bytes
+        self.redactor = redactor
+        self.out = None
+        self.sink = None
+        self.dedup = None
+        self.count = 0
+
+    def __enter__(self):
+        self.out = self.stream
+        if self.out is None:
+            self.out = open_text(self.output_path, self.compression)
+        if self.redactor:
+            # Every byte of the archive, headers included, passes through it
+            self.out = self.redactor.wrap(self.out)
+        self.sink = self.out
+        if self.dedup_min_bytes:
+            self.dedup = self.sink = BlockDeduplicator(self.out, self.dedup_min_bytes)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.dedup and exc_type is None:
+            self.dedup.flush()
+        self.out.close()
+        if exc_type is not None and self.stream is None:
+            self.output_path.unlink(missing_ok=True)
+        return False
+
+    def write_header(
+        self, entries: List[Dict], shard: Optional[Tuple[int, int]] = None
+    ):
+        """Write the preamble and a table of contents for the given entries
+
+        Each entry needs "name", "size" (source bytes) and "mtime". shard is
+        (number, total) when the export is split across several files.
+        """
+        self.out.write(preamble(len(entries), shard))
+        for i, entry in enumerate(entries, 1):
+            self.out.write(toc_line(i, entry))
+        self.out.write(TOC_END)
+
+    def begin(self, name: str) -> TextIO:
+        """Start a session section and return the stream to write its body to"""
+        if self.dedup:
+            self.dedup.begin(name)
+        self.count += 1
+        self.out.write(banner(name))
+        return self.sink
+
+    def add_file(self, name: str, markdown: Path):
+        """Copy an already converted session into the archive"""
+        # Opened first, so a missing file leaves no half-written section
+        with open(markdown, encoding="utf-8") as src:
+            shutil.copyfileobj(src, self.begin(name), CHUNK_BYTES)
+
+    def add_tail(self, name: str, markdown: Path, max_chars: int):
+        """Copy only the last max_chars of a session, starting on a message"""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        with open(markdown, "rb") as src:
+            out = self.begin(name)
+            start = max(0, os.fstat(src.fileno()).st_size - max_chars)
+            src.seek(start)
+            head = decoder.decode(src.read(CHUNK_BYTES))
+            # Skip ahead to the next message header so no turn is cut in half
+            cut = head.find("\n## ")
+            if cut < 0:
+                cut = head.find("\n")
+            head = head[cut + 1 :]
+            out.write(
+                f"[Truncated to fit the token budget: {start / 1024:.1f} KB of "
+                "earlier conversation omitted]\n\n"
+            )
+            out.write(head)
+            while chunk := src.read(CHUNK_BYTES):
+                out.write(decoder.decode(chunk))
+            out.write(decoder.decode(b"", final=True))
+
+    def add_range(
+        self, name: str, markdown: Path, start: int, end: int, part: Tuple[int, int]
+    ):
+        """Copy bytes [start, end) of a session split across shards"""
+        out = self.begin(name)
+        out.write(part_note(part))
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        with open(markdown, "rb") as src:
+            src.seek(start)
+            remaining = end - start
+            while remaining > 0 and (chunk := src.read(min(CHUNK_BYTES, remaining))):
+                remaining -= len(chunk)
+                out.write(decoder.decode(chunk))
+            out.write(decoder.decode(b"", final=True))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Worker processes that render sessions to Markdown outside the main interpreter.
+
+The native converter is pure Python and holds the GIL while it renders, so
+threads convert one session at a time however many there are. A RenderPool
+runs each render in a worker process instead. The worker writes into a
+temporary file, which the caller's thread then copies into its own output,
+so the pool fits wherever a Renderer does (see chat_cache).
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional, TextIO, Tuple
+
+from chat_converter import convert_session
+from chat_elide import ElisionPolicy
+from chat_graph import convert_thread
+from chat_reader import convert_slice
+
+
+def _policy(config: Optional[Dict]) -> Optional[ElisionPolicy]:
+    return ElisionPolicy(config) if config is not None else None
+
+
+def _counts(policy: Optional[ElisionPolicy]) -> Tuple[int, int]:
+    return (policy.elided, policy.saved_bytes) if policy else (0, 0)
+
+
+def render_job(
+    path: str, src: Path, offset: int, thread: str, config: Optional[Dict]
+) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """Render src into path; returns the renderer's result and the elision counts"""
+    policy = _policy(config)
+    elider = policy.session() if policy else None
+    with open(path, "w", encoding="utf-8") as out:
+        if thread == "all":
+            result = convert_session(src, out, offset, elider)
+        else:
+            result = convert_thread(src, out, thread, elider)
+    return result, _counts(policy)
+
+
+def slice_job(
+    path: str, src: Path, start: float, thread: str, config: Optional[Dict]
+) -> Tuple[int, Tuple[int, int]]:
+    """Render the records of src from start on into path"""
+    policy = _policy(config)
+    elider = policy.session() if policy else None
+    with open(path, "w", encoding="utf-8") as out:
+        result = convert_slice(src, out, start, thread=thread, elider=elider)
+    return result, _counts(policy)
+
+
+class RenderPool:
+    """Renders sessions the way ChatAnalyzer.render_session does, one per process
+
+    Workers are spawned rather than forked, since the pool is started from a
+    process that already runs threads. Elision totals are counted in the
+    workers and added to the caller's policy.
+    """
+
+    def __init__(self, workers: int, thread: str, policy: Optional[ElisionPolicy]):
+        self.thread = thread
+        self.policy = policy
+        self.config = (
+            {"default": policy.default, "tools": policy.tools} if policy else None
+        )
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def render(self, src: Path, out: TextIO, offset: int = 0) -> Tuple[int, int]:
+        """A Renderer: src from offset on, or its whole thread"""
+        return self._run(out, render_job, src, offset)
+
+    def slice(self, src: Path, out: TextIO, start: float) -> int:
+        return self._run(out, slice_job, src, start)
+
+    def _run(self, out: TextIO, job: Callable, src: Path, arg):
+        fd, path = tempfile.mkstemp(suffix=".md")
+        os.close(fd)
+        try:
+            future = self.pool.submit(job, path, src, arg, self.thread, self.config)
+            result, (elided, saved) = future.result()
+            with open(path, encoding="utf-8") as rendered:
+                shutil.copyfileobj(rendered, out)
+        finally:
+            os.unlink(path)
+        if self.policy and elided:
+            self.policy.count(saved, elided)
+        return result
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
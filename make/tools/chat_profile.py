@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Per-stage wall and CPU time, conversion latencies and memory for one run."""
+
+import contextlib
+import cProfile
+import json
+import resource
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Upper bounds of the conversion latency buckets, in milliseconds
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """Peak resident set size of this process, or its largest child"""
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def children_cpu_s() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Profiler:
+    """Accumulates time per named stage across calls and threads.
+
+    CPU time is per thread, so stages running concurrently on a pool are
+    each charged only their own work; their wall times overlap, and the
+    sum of stage wall times can exceed the elapsed time of the run. Time
+    spent in subprocesses such as claude2md shows up as the stage's wall
+    time and in the children's CPU total.
+
+    With dump set, the whole run also goes under a single cProfile, from
+    construction until write. Since Python 3.12 cProfile hooks the
+    interpreter through sys.monitoring, which is process-wide, so a second
+    profile can't be started per stage or thread; the stats cover every
+    thread at once and can't be split by stage.
+    """
+
+    def __init__(self, dump: Optional[Path] = None):
+        self.dump = dump
+        self.lock = threading.Lock()
+        self.stages: Dict[str, Dict] = {}
+        self.latencies: List[float] = []
+        self.statuses = Counter()
+        self.bytes_in = 0
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        self.children_started = children_cpu_s()
+        self.cprofile = None
+        if dump:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.thread_time() - cpu
+            with self.lock:
+                totals = self.stages.setdefault(
+                    name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0}
+                )
+                totals["calls"] += 1
+                totals["wall_s"] += wall
+                totals["cpu_s"] += cpu
+
+    def record_file(self, seconds: float, status: str, bytes_in: int):
+        """One session's conversion time, outcome and input size"""
+        with self.lock:
+            self.latencies.append(seconds)
+            self.statuses[status] += 1
+            self.bytes_in += bytes_in
+
+    def histogram(self) -> Dict[str, int]:
+        counts = Counter()
+        for seconds in self.latencies:
+            ms = seconds * 1000
+            bound = next((b for b in BUCKETS_MS if ms <= b), None)
+            counts[f"<={bound}" if bound else f">{BUCKETS_MS[-1]}"] += 1
+        labels = [f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+        return {label: counts[label] for label in labels if counts[label]}
+
+    def report(self, outputs: List[Path]) -> Dict:
+        """Everything measured so far; outputs are the files this run wrote"""
+        latencies = sorted(self.latencies)
+        latency = {}
+        if latencies:
+            ms = [s * 1000 for s in latencies]
+            cuts = (
+                statistics.quantiles(ms, n=100, method="inclusive")
+                if len(ms) > 1
+                else ms * 99
+            )
+            latency = {
+                "p50": round(cuts[49], 3),
+                "p90": round(cuts[89], 3),
+                "p99": round(cuts[98], 3),
+                "max": round(ms[-1], 3),
+            }
+        slowest = max(self.stages, key=lambda n: self.stages[n]["wall_s"], default=None)
+        return {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "command": sys.argv,
+            "wall_s": time.perf_counter() - self.started,
+            "cpu_s": time.process_time() - self.cpu_started,
+            "children_cpu_s": children_cpu_s() - self.children_started,
+            "peak_rss_mb": peak_rss_mb(),
+            "children_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+            "stages": self.stages,
+            "slowest_stage": slowest,
+            "files": {
+                "count": len(latencies),
+                "statuses": dict(self.statuses),
+                "bytes_in": self.bytes_in,
+                "latency_ms": latency,
+                "histogram_ms": self.histogram(),
+            },
+            "outputs": [str(path) for path in outputs],
+            "bytes_out": sum(path.stat().st_size for path in outputs if path.exists()),
+        }
+
+    def write(self, path: Path, outputs: List[Path]) -> Dict:
+        """Write the JSON report, and the run's cProfile stats if asked"""
+        if self.cprofile:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.dump)
+        report = self.report(outputs)
+        if self.cprofile:
+            report["cprofile"] = {"scope": "run", "path": str(self.dump)}
+        path.write_text(json.dumps(report, indent=2) + "\n")
+        return report
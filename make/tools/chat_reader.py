@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""Memory-mapped random access to huge session files via a line-offset index."""
+
+import hashlib
+import json
+import mmap
+import re
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+from chat_converter import render_record
+from chat_graph import SessionGraph
+from chat_index import CACHE_DIR, SessionIndex, boundary_hash
+
+LINE_INDEX_DIR = CACHE_DIR / "line-index"
+MAGIC = b"CLIX1\n"
+HEADER = struct.Struct("<Q32sQ")  # bytes indexed, boundary digest, line count
+TIMESTAMP = re.compile(rb'"timestamp"\s*:\s*"([^"]+)"')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS time_ranges (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    min_ts REAL,
+    max_ts REAL
+);
+"""
+
+
+def line_index_path(path: Path, index_dir: Path = LINE_INDEX_DIR) -> Path:
+    """Where the line index of the session at path is kept"""
+    digest = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:32]
+    return index_dir / f"{digest}.idx"
+
+
+def drop_line_indexes(paths: List[str], index_dir: Path = LINE_INDEX_DIR):
+    """Delete the line indexes of sessions that were removed or archived"""
+    for path in paths:
+        line_index_path(Path(path), index_dir).unlink(missing_ok=True)
+
+
+def parse_timestamp(value: str) -> Optional[float]:
+    """Epoch seconds for an ISO 8601 timestamp, None if it cannot be parsed"""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (ValueError, AttributeError):
+        return None
+
+
+class SessionReader:
+    """Seekable view of one session file.
+
+    The index stores each line's start offset and the running maximum of the
+    record timestamps seen so far, which is monotonic even when sub-agent
+    records interleave slightly out of order. It is persisted next to the
+    other analyzer caches and extended in place when the session grows.
+    """
+
+    def __init__(self, path: Path, index_dir: Path = LINE_INDEX_DIR):
+        self.path = path
+        self.index_path = line_index_path(path, index_dir)
+        self.offsets = array("Q")
+        self.times = array("d")
+        self.indexed = 0
+        self.fp = open(path, "rb")
+        size = self.path.stat().st_size
+        self.mm = b""
+        if size:
+            self.mm = mmap.mmap(self.fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self._load()
+        if self.indexed < len(self.mm):
+            self._extend()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+        self.fp.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _load(self):
+        """Read the sidecar if it still describes a prefix of the file"""
+        try:
+            with open(self.index_path, "rb") as fp:
+                if fp.read(len(MAGIC)) != MAGIC:
+                    return
+                indexed, boundary, count = HEADER.unpack(fp.read(HEADER.size))
+                if indexed > len(self.mm):
+                    return
+                if bytes.fromhex(boundary_hash(self.path, indexed)) != boundary:
+                    return
+                self.offsets.fromfile(fp, count)
+                self.times.fromfile(fp, count)
+                self.indexed = indexed
+        except (FileNotFoundError, EOFError, struct.error, ValueError):
+            self.offsets = array("Q")
+            self.times = array("d")
+            self.indexed = 0
+
+    def _extend(self):
+        """Index the lines appended since the sidecar was written, then save it"""
+        mm = self.mm
+        pos = self.indexed
+        latest = self.times[-1] if self.times else 0.0
+        while True:
+            end = mm.find(b"\n", pos)
+            if end < 0:
+                # A record still being written is left for the next open
+                break
+            timestamp = self._line_timestamp(pos, end)
+            if timestamp is not None:
+                latest = max(latest, timestamp)
+            self.offsets.append(pos)
+            self.times.append(latest)
+            pos = end + 1
+        self.indexed = pos
+        self._save()
+
+    def _line_timestamp(self, start: int, end: int) -> Optional[float]:
+        matches = []
+        for match in TIMESTAMP.finditer(self.mm, start, end):
+            matches.append(match)
+            if len(matches) > 1:
+                break
+        if not matches:
+            return None
+        if len(matches) == 1:
+            return parse_timestamp(matches[0].group(1).decode("ascii", "replace"))
+        # Nested objects carry their own timestamps; only the record's counts
+        record = self._parse(start, end)
+        return parse_timestamp(record.get("timestamp")) if record else None
+
+    def _save(self):
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as fp:
+                boundary = bytes.fromhex(boundary_hash(self.path, self.indexed))
+                fp.write(MAGIC)
+                fp.write(HEADER.pack(self.indexed, boundary, len(self.offsets)))
+                self.offsets.tofile(fp)
+                self.times.tofile(fp)
+            tmp_path.replace(self.index_path)
+        except OSError:
+            pass  # The index is only an accelerator
+
+    def _parse(self, start: int, end: int) -> Optional[Dict]:
+        try:
+            record = json.loads(self.mm[start:end])
+        except ValueError:
+            return None
+        return record if isinstance(record, dict) else None
+
+    def line_bounds(self, i: int):
+        start = self.offsets[i]
+        end = self.offsets[i + 1] - 1 if i + 1 < len(self.offsets) else self.indexed - 1
+        return start, end
+
+    def record(self, i: int) -> Optional[Dict]:
+        """Parse line i only"""
+        return self._parse(*self.line_bounds(i))
+
+    def time_range(self) -> Tuple[Optional[float], Optional[float]]:
+        """Epoch seconds of the first and latest timestamped records"""
+        if not self.times or not self.times[-1]:
+            return None, None
+        first = next(t for t in self.times if t)
+        return first, self.times[-1]
+
+    def between(
+        self, start: float, end: float, keep: Optional[Set[int]] = None
+    ) -> Iterator[Dict]:
+        """Records timestamped in [start, end] (epoch seconds), seeking to them
+
+        keep optionally limits the result to these line numbers.
+        """
+        first = bisect_left(self.times, start)
+        last = bisect_right(self.times, end)
+        for i in range(first, min(last + 1, len(self))):
+            if keep is not None and i not in keep:
+                continue
+            record = self.record(i)
+            if not record:
+                continue
+            timestamp = parse_timestamp(record.get("timestamp"))
+            if timestamp is not None and start <= timestamp <= end:
+                yield record
+
+    def last_turns(self, n: int, keep: Optional[Set[int]] = None) -> List[Dict]:
+        """Records of the last n turns, each starting at a user prompt"""
+        records = []
+        prompts = 0
+        for i in range(len(self) - 1, -1, -1):
+            if keep is not None and i not in keep:
+                continue
+            record = self.record(i)
+            if not record:
+                continue
+            records.append(record)
+            if is_prompt(record):
+                prompts += 1
+                if prompts == n:
+                    break
+        records.reverse()
+        return records
+
+
+def is_prompt(record: Dict) -> bool:
+    """A user record typed by a person rather than a returned tool result"""
+    if record.get("type") != "user":
+        return False
+    content = (record.get("message") or {}).get("content")
+    if isinstance(content, list):
+        return any(
+            isinstance(b, dict) and b.get("type") != "tool_result" for b in content
+        )
+    return bool(content)
+
+
+class TimeRanges:
+    """Cached (min_ts, max_ts) per session, valid while its size and mtime hold"""
+
+    def __init__(self, sessions: SessionIndex):
+        self.conn = sessions.conn
+        self.conn.executescript(SCHEMA)
+
+    def ranges(
+        self, files: List[Tuple[Path, int, float]]
+    ) -> Dict[Path, Tuple[Optional[float], Optional[float]]]:
+        """Time range of each (path, size, mtime); only changed files are read"""
+        cached = {
+            path: rest
+            for path, *rest in self.conn.execute(
+                "SELECT path, size, mtime, min_ts, max_ts FROM time_ranges"
+            )
+        }
+        ranges = {}
+        for path, size, mtime in files:
+            hit = cached.get(str(path))
+            if hit and hit[0] == size and hit[1] == mtime:
+                ranges[path] = (hit[2], hit[3])
+                continue
+            try:
+                with SessionReader(path) as reader:
+                    ranges[path] = reader.time_range()
+            except FileNotFoundError:
+                continue
+            self.conn.execute(
+                "INSERT OR REPLACE INTO time_ranges VALUES (?, ?, ?, ?, ?)",
+                (str(path), size, mtime, *ranges[path]),
+            )
+        self.conn.commit()
+        return ranges
+
+
+def convert_slice(
+    src: Path,
+    out: TextIO,
+    start: float,
+    end: float = float("inf"),
+    thread: str = "all",
+    elider=None,
+) -> int:
+    """Write the Markdown for records of src within [start, end]; returns records"""
+    since = datetime.fromtimestamp(start, timezone.utc)
+    out.write(f"# Claude session {src.stem}\n\n")
+    out.write(f"_Messages since {since:%Y-%m-%d %H:%M} UTC; earlier ones omitted._\n\n")
+    keep = SessionGraph.build(src).select(thread) if thread != "all" else None
+    written = 0
+    with SessionReader(src) as reader:
+        for record in reader.between(start, end, keep):
+            section = render_record(record, elider)
+            if section:
+                out.write(section)
+                written += 1
+    return written
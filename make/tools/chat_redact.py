@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""Redaction of API keys and tokens in exported text with one combined regex."""
+
+import hashlib
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, TextIO
+
+# name: (literals every match starts with, pattern). Alternatives are tried in
+# order, so specific prefixes (sk-ant-, sk-or-v1-) come before the general
+# ones they overlap with. Where a group named keep_<name> matches, the text up
+# to its end is kept and only the rest is replaced.
+PATTERNS = {
+    "anthropic": (("sk-",), r"sk-ant-[A-Za-z0-9_-]{20,}"),
+    "openrouter": (("sk-",), r"sk-or-v1-[A-Za-z0-9]{32,}"),
+    "openai": (("sk-",), r"sk-(?:proj-)?[A-Za-z0-9_-]{20,}"),
+    "perplexity": (("pplx-",), r"pplx-[A-Za-z0-9]{32,}"),
+    "github": (
+        ("ghp_", "gho_", "ghu_", "ghs_", "ghr_", "github_pat_"),
+        r"(?:gh[pousr]_[A-Za-z0-9]{36,}|github_pat_[A-Za-z0-9_]{22,})",
+    ),
+    "google": (("AIza",), r"AIza[0-9A-Za-z_-]{35}"),
+    "aws": (("AKIA", "ASIA"), r"(?:AKIA|ASIA)[0-9A-Z]{16}"),
+    "slack": (("xox",), r"xox[abeprs]-[A-Za-z0-9-]{10,}"),
+    "jwt": (
+        ("eyJ",),
+        r"eyJ[A-Za-z0-9_-]{8,}\.eyJ[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,}",
+    ),
+    "bearer": (
+        ("Bearer", "bearer"),
+        r"(?P<keep_bearer>[Bb]earer\s+)[A-Za-z0-9._~+/-]{20,}=*",
+    ),
+    "url_password": (
+        ("://",),
+        r"(?P<keep_url_password>://[^\s:/@]+:)[^\s@/]{3,}(?=@)",
+    ),
+}
+# Patterns for .env-style assignments, tried from the start of each line that
+# contains one of the literals. Only a line that is nothing but NAME=value,
+# with a quoted value or one free of expression characters, is redacted, so
+# code such as `API_KEY = os.environ.get(...)` passes through unchanged.
+LINE_PATTERNS = {
+    "env": (
+        ("KEY", "TOKEN", "SECRET", "PASSWORD"),
+        r"(?m:^)(?P<keep_env>[ \t]*(?:export[ \t]+)?"
+        r"[A-Z0-9_]*(?:KEY|TOKEN|SECRET|PASSWORD)[A-Z0-9_]*"
+        r"[ \t]*[=:][ \t]*(?P<quote_env>[\"'])?)"
+        r"(?(quote_env)[^\"'\n]{8,}|[^\s\"'`()\[\]{}.,;=]{8,})"
+        r"(?=(?(quote_env)(?P=quote_env))[ \t]*(?m:$))",
+    ),
+}
+# No token above spans more than this many characters of one line, however
+# long a JWT's payload gets
+MAX_MATCH = 1 << 14
+BATCH_CHARS = 1 << 16
+CHUNK_CHARS = 1 << 20
+
+
+class SecretRedactor:
+    """Built-in patterns compiled into one alternation that decides every match.
+
+    Each named pattern becomes a group of one regex, and the group that
+    matched names the secret's kind. Python's regex engine tries every
+    alternative at every character, which runs at a few MB/s, so the
+    combined regex is only tried where one of the patterns' leading
+    literals occurs; str.find locates those at memory speed. Text with no
+    candidates (most of an export) is passed through untouched.
+
+    Line patterns are tried from the start of each line holding one of
+    their literals, which is where such a match has to begin.
+
+    Extra patterns have no known literals. Each runs as its own pass over
+    the text, where the engine can still skip ahead to a literal prefix.
+
+    Counts and throughput are shared by every stream the redactor wraps,
+    so shards written concurrently add up to one total.
+    """
+
+    def __init__(self, extra: List[str] = ()):
+        self.regex = re.compile(
+            "|".join(f"(?P<{name}>{p})" for name, (_, p) in PATTERNS.items())
+        )
+        self.line_regex = re.compile(
+            "|".join(f"(?P<{name}>{p})" for name, (_, p) in LINE_PATTERNS.items())
+        )
+        self.anchors = sorted({a for anchors, _ in PATTERNS.values() for a in anchors})
+        self.line_anchors = sorted(
+            {a for anchors, _ in LINE_PATTERNS.values() for a in anchors}
+        )
+        self.patterns = list(extra)
+        self.extra = []
+        for i, pattern in enumerate(extra, 1):
+            try:
+                self.extra.append((f"custom{i}", re.compile(pattern)))
+            except re.error as e:
+                raise ValueError(f"Invalid redaction pattern '{pattern}': {e}")
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.scanned = 0
+        self.seconds = 0.0
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the patterns, so text redacted with different ones is known"""
+        sources = [self.regex.pattern, self.line_regex.pattern]
+        sources += self.patterns
+        return hashlib.sha256("\0".join(sources).encode()).hexdigest()[:16]
+
+    def candidates(self, text: str) -> List[int]:
+        """Sorted offsets at which some pattern's match may begin"""
+        starts = set()
+        for anchor in self.anchors:
+            pos = text.find(anchor)
+            while pos >= 0:
+                starts.add(pos)
+                pos = text.find(anchor, pos + 1)
+        for anchor in self.line_anchors:
+            pos = text.find(anchor)
+            while pos >= 0:
+                line = text.rfind("\n", 0, pos) + 1
+                starts.add(line)
+                # One try per line is enough
+                end = text.find("\n", pos)
+                pos = text.find(anchor, end) if end >= 0 else -1
+        return sorted(starts)
+
+    def match(self, text: str, pos: int) -> Optional[re.Match]:
+        """The built-in match starting at pos, if any"""
+        return self.regex.match(text, pos) or self.line_regex.match(text, pos)
+
+    def safe_cut(self, text: str, limit: int) -> int:
+        """Offset at most limit where text can be split without hiding a token
+
+        The cut is moved back only to the start of a match it would split.
+        Callers leave the last MAX_MATCH characters beyond limit, so a token
+        still incomplete at the end of text begins past the cut.
+        """
+        spans = [
+            match.span()
+            for pos in self.candidates(text)
+            if pos < limit and (match := self.match(text, pos))
+        ]
+        for _, regex in self.extra:
+            spans += [match.span() for match in regex.finditer(text)]
+        # A match ending right at the cut may rely on lookahead past it
+        for start, end in sorted(spans, reverse=True):
+            if start < limit <= end:
+                limit = start
+        return max(limit, 0)
+
+    def redact(self, text: str) -> str:
+        start = time.perf_counter()
+        found = Counter()
+        scanned = len(text)
+
+        parts = []
+        done = 0
+        for pos in self.candidates(text):
+            match = self.match(text, pos) if pos >= done else None
+            if match:
+                # The enclosing pattern group closes last, after any keep group
+                kind = match.lastgroup
+                keep = f"keep_{kind}"
+                kept = ""
+                if keep in match.re.groupindex:
+                    kept = text[pos : match.end(keep)]
+                parts += [text[done:pos], f"{kept}[REDACTED:{kind}]"]
+                found[kind] += 1
+                done = match.end()
+        if parts:
+            text = "".join(parts) + text[done:]
+
+        for kind, regex in self.extra:
+            text, n = regex.subn(f"[REDACTED:{kind}]", text)
+            found[kind] += n
+
+        with self.lock:
+            self.counts.update(+found)
+            self.scanned += scanned
+            self.seconds += time.perf_counter() - start
+        return text
+
+    def wrap(self, out: TextIO) -> "RedactingWriter":
+        return RedactingWriter(self, out)
+
+    def summary(self) -> Dict:
+        """Totals for reports: matches per kind, MB scanned and MB/s"""
+        mb = self.scanned / (1024 * 1024)
+        return {
+            "matches": dict(self.counts),
+            "scanned_mb": mb,
+            "mb_per_s": mb / self.seconds if self.seconds else None,
+        }
+
+
+class RedactingWriter:
+    """Text sink that redacts whole lines, a batch at a time, before passing them on
+
+    Writes are collected until BATCH_CHARS have arrived, so the per-call
+    cost of redact() is paid per batch rather than per rendered record. Only
+    complete lines are released; the partial line is held back so a token
+    split across two writes is still seen whole. A very long line is
+    released in pieces, cut only where SecretRedactor.safe_cut finds that
+    no token can straddle.
+
+    Held text stays a list of pieces. It is joined only once the next
+    release is due, and a release that leaves text behind pushes the next
+    one out to twice that length, so a line longer than a batch is joined
+    a logarithmic number of times rather than once per write.
+    """
+
+    def __init__(self, redactor: SecretRedactor, out: TextIO):
+        self.redactor = redactor
+        self.out = out
+        self.pieces: List[str] = []
+        self.size = 0
+        self.due = BATCH_CHARS
+
+    def write(self, text: str) -> int:
+        self.pieces.append(text)
+        self.size += len(text)
+        if self.size >= self.due:
+            pending = "".join(self.pieces)
+            cut = pending.rfind("\n") + 1
+            if not cut and len(pending) > CHUNK_CHARS:
+                cut = self.redactor.safe_cut(pending, len(pending) - MAX_MATCH)
+            if cut:
+                self.out.write(self.redactor.redact(pending[:cut]))
+                pending = pending[cut:]
+            self.pieces = [pending] if pending else []
+            self.size = len(pending)
+            self.due = max(BATCH_CHARS, 2 * self.size)
+        return len(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        if self.size:
+            self.out.write(self.redactor.redact("".join(self.pieces)))
+        self.pieces = []
+        self.size = 0
+        self.due = BATCH_CHARS
+
+    def close(self):
+        self.flush()
+        self.out.close()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Incremental SQLite FTS5 full-text index over Claude conversation logs."""
+
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+from chat_converter import read_complete, record_text
+from chat_index import (
+    COMMIT_SECONDS,
+    MergedIndex,
+    add_columns,
+    add_root_column,
+    boundary_hash,
+    resume_point,
+    root_of,
+)
+from chat_redact import SecretRedactor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_files (
+    path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    boundary TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages USING fts5(
+    text,
+    project UNINDEXED,
+    path UNINDEXED,
+    timestamp UNINDEXED,
+    role UNINDEXED,
+    tokenize = 'unicode61'
+);
+"""
+
+
+class SearchIndex:
+    """Full-text index of message text, fed only with newly appended lines.
+
+    Each session remembers the byte offset indexed so far and a checksum of
+    the bytes before it; a file that shrank or was rewritten is reindexed.
+    Sessions are kept per projects root, so a run over other roots neither
+    sees nor forgets them.
+
+    Text is redacted before it is stored, with the built-in patterns even
+    under --no-redact, so neither the index nor its snippets hold secrets.
+    Each session records the patterns its rows were redacted with.
+    """
+
+    def __init__(
+        self, sessions: MergedIndex, redactor: Optional[SecretRedactor] = None
+    ):
+        self.sessions = sessions
+        self.conn = sessions.conn
+        # A redactor of its own, so indexing doesn't add to an export's counts
+        self.redactor = SecretRedactor(redactor.patterns if redactor else [])
+        self.conn.executescript(SCHEMA)
+        add_root_column(self.conn, "search_files")
+        add_columns(
+            self.conn, "search_files", {"redaction": "TEXT NOT NULL DEFAULT ''"}
+        )
+
+    def update(self) -> int:
+        """Index whatever was appended since the last update; returns new rows"""
+        self._redact_stale()
+        indexed = {
+            path: (offset, boundary, root)
+            for path, offset, boundary, root in self.conn.execute(
+                "SELECT path, offset, boundary, root FROM search_files"
+            )
+        }
+        added = 0
+        live = set()
+
+        committed = time.monotonic()
+        for path, project, size, _ in self.sessions.all_files():
+            key = str(path)
+            live.add(key)
+            offset, boundary, _ = indexed.get(key, (0, "", ""))
+            try:
+                start = resume_point(path, size, offset, boundary)
+                if start is None:
+                    continue
+                if start == 0:
+                    self._forget(key)
+                added += self._index_file(path, project, start)
+                # Short transactions leave the manifest writable meanwhile
+                if time.monotonic() - committed > COMMIT_SECONDS:
+                    self.conn.commit()
+                    committed = time.monotonic()
+            except FileNotFoundError:
+                continue
+
+        # Bundled sessions stay searchable without their live file
+        roots = set(self.sessions.roots)
+        archived = self.sessions.archived()
+        for key, (_, _, root) in indexed.items():
+            if root in roots and key not in live and key not in archived:
+                self._forget(key)
+        self.conn.commit()
+        return added
+
+    def _index_file(self, path, project: str, offset: int) -> int:
+        rows = []
+        with open(path, "rb") as fp:
+            fp.seek(offset)
+            for length, record in read_complete(fp):
+                offset += length
+                if record is None:
+                    continue
+                text = self.redactor.redact(record_text(record))
+                if text.strip():
+                    rows.append(
+                        (
+                            text,
+                            project,
+                            str(path),
+                            record.get("timestamp", ""),
+                            record.get("type", ""),
+                        )
+                    )
+
+        self.conn.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?)", rows)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO search_files "
+            "(path, offset, boundary, root, redaction) VALUES (?, ?, ?, ?, ?)",
+            (
+                str(path),
+                offset,
+                boundary_hash(path, offset),
+                root_of(path),
+                self.redactor.fingerprint,
+            ),
+        )
+        return len(rows)
+
+    def _redact_stale(self):
+        """Redact rows stored before redaction, or with other patterns, in place
+
+        Rewriting the rows rather than reindexing also covers bundled
+        sessions, whose live file is gone. Text already redacted stays so.
+        """
+        fingerprint = self.redactor.fingerprint
+        stale = [
+            path
+            for (path,) in self.conn.execute(
+                "SELECT path FROM search_files WHERE redaction != ?", (fingerprint,)
+            )
+        ]
+        changed = 0
+        committed = time.monotonic()
+        for path in stale:
+            rows = self.conn.execute(
+                "SELECT rowid, text FROM messages WHERE path = ?", (path,)
+            ).fetchall()
+            updates = [
+                (redacted, rowid)
+                for rowid, text in rows
+                if (redacted := self.redactor.redact(text)) != text
+            ]
+            self.conn.executemany(
+                "UPDATE messages SET text = ? WHERE rowid = ?", updates
+            )
+            self.conn.execute(
+                "UPDATE search_files SET redaction = ? WHERE path = ?",
+                (fingerprint, path),
+            )
+            changed += len(updates)
+            if time.monotonic() - committed > COMMIT_SECONDS:
+                self.conn.commit()
+                committed = time.monotonic()
+        self.conn.commit()
+        if changed:
+            # Replaced text lingers in FTS5 segments and free pages until both
+            # are rewritten
+            self.conn.execute("INSERT INTO messages(messages) VALUES ('optimize')")
+            self.conn.commit()
+            self.conn.execute("VACUUM")
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _forget(self, key: str):
+        self.conn.execute("DELETE FROM messages WHERE path = ?", (key,))
+        self.conn.execute("DELETE FROM search_files WHERE path = ?", (key,))
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[Dict]:
+        """Best matches for an FTS5 query, falling back to a literal phrase"""
+        roots = self.sessions.roots
+        sql = (
+            "SELECT project, path, timestamp, role, "
+            "snippet(messages, 0, '[', ']', '…', 16) "
+            "FROM messages WHERE messages MATCH ? AND path IN "
+            "(SELECT path FROM search_files WHERE root IN "
+            f"({', '.join('?' * len(roots))})) ORDER BY rank LIMIT ? OFFSET ?"
+        )
+        try:
+            rows = self.conn.execute(sql, (query, *roots, limit, offset)).fetchall()
+        except sqlite3.OperationalError:
+            # Not valid FTS5 syntax (e.g. contains '-' or ':'); search it verbatim
+            phrase = '"' + query.replace('"', '""') + '"'
+            rows = self.conn.execute(sql, (phrase, *roots, limit, offset)).fetchall()
+
+        return [
+            {
+                "project": project,
+                "path": path,
+                "timestamp": timestamp,
+                "role": role,
+                "snippet": snippet,
+            }
+            for project, path, timestamp, role, snippet in rows
+        ]
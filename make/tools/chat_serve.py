@@ -0,0 +1,652 @@
+#!/usr/bin/env python3
+"""Read-only HTTP API over the session index for local dashboards.
+
+Endpoints (GET or HEAD; JSON unless noted):
+
+    /                               this list
+    /projects                       projects, most recently active first
+    /sessions?project=NAME          sessions, newest first; NAME may be a glob
+    /sessions/ID                    one session as Markdown, streamed
+    /search?q=QUERY                 full-text matches (SQLite FTS5 syntax)
+    /stats/projects, /stats/days    usage rollups; filter with projects=A,B
+                                    and max_age=2d
+    /export?projects=A,B&max_age=2d packed Markdown archive, streamed
+
+Lists take offset= and limit= and return {"items", "offset", "limit",
+"total", "next"}, where next is the URL of the following page or null and
+total is null for search, whose match count is not known up front.
+
+Every response carries a weak ETag made from the manifest's state and the
+request. A dashboard polling with If-None-Match gets a 304 without the
+query being run again, until a session is added, grows or is archived;
+answers filtered by max_age also change tag every minute, as sessions age
+out of the window.
+
+Requests must name the server in their Host header as localhost, an IP
+address or the --host given, with the port it listens on. A web page whose
+domain was rebound to this machine's address is turned away.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import ipaddress
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Set, TextIO, Tuple
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+
+import chat_converter
+from chat_elide import format_bytes
+from chat_index import ManifestSnapshot, connect, in_memory
+from chat_packer import ArchiveWriter
+from chat_search import SearchIndex
+from chat_stats import SessionStats
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# The manifest is re-read at most this often, however many requests arrive
+REFRESH_SECONDS = 2.0
+CACHED_RESPONSES = 256
+STREAM_CHUNK_CHARS = 1 << 16
+STREAM_QUEUE_CHUNKS = 8
+IDLE_SECONDS = 30.0
+MAX_HEADER_BYTES = 64 * 1024
+
+ENDPOINTS = {
+    "/projects": "Projects, most recently active first",
+    "/sessions": "Sessions newest first; project= selects a project or glob",
+    "/sessions/{id}": "One session as Markdown (streamed)",
+    "/search": "Full-text matches for q= (SQLite FTS5 syntax)",
+    "/stats/projects": "Usage per project; projects= and max_age= filter it",
+    "/stats/days": "Usage per UTC day; projects= and max_age= filter it",
+    "/export": "Packed Markdown of projects= newer than max_age= (streamed)",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class QueueWriter:
+    """Text sink for a worker thread that hands encoded chunks to the event loop
+
+    The queue is bounded, so a slow client holds the export back rather
+    than letting it pile up in memory. Once the client is gone, writes
+    raise BrokenPipeError and the export stops.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        self.loop = loop
+        self.queue = queue
+        self.pieces: List[str] = []
+        self.size = 0
+        self.gone = False
+        self.closed = False
+
+    def _put(self, item: Optional[bytes]):
+        if self.gone:
+            raise BrokenPipeError("Client disconnected")
+        asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop).result()
+
+    def write(self, text: str) -> int:
+        self.pieces.append(text)
+        self.size += len(text)
+        if self.size >= STREAM_CHUNK_CHARS:
+            self.flush()
+        return len(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        if self.size:
+            data = "".join(self.pieces).encode("utf-8")
+            self.pieces = []
+            self.size = 0
+            self._put(data)
+
+    def close(self):
+        if not self.closed and not self.gone:
+            self.closed = True
+            self.flush()
+            self._put(None)
+
+
+def parse_etags(header: str) -> Set[str]:
+    """Tags listed in an If-None-Match header, weak or strong alike"""
+    tags = set()
+    for tag in header.split(","):
+        tag = tag.strip()
+        tags.add(tag[2:] if tag.startswith("W/") else tag)
+    return tags - {""}
+
+
+def page_bounds(params: Dict[str, str]) -> Tuple[int, int]:
+    try:
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", PAGE_SIZE))
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "offset and limit must be integers")
+    if offset < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HttpError(
+            HTTPStatus.BAD_REQUEST,
+            f"offset must be >= 0 and limit between 1 and {MAX_PAGE_SIZE}",
+        )
+    return offset, limit
+
+
+def page(
+    path: str,
+    params: Dict[str, str],
+    items: List,
+    offset: int,
+    limit: int,
+    total: Optional[int],
+) -> Dict:
+    """One page of items; without a total, a page with more than limit has a next"""
+    more = total > offset + limit if total is not None else len(items) > limit
+    following = None
+    if more:
+        following = f"{path}?{urlencode(dict(params, offset=offset + limit))}"
+    return {
+        "items": items[:limit],
+        "offset": offset,
+        "limit": limit,
+        "total": total,
+        "next": following,
+    }
+
+
+class ApiServer:
+    """Answers requests on the event loop thread, which owns the index connection.
+
+    Queries run on the loop, between requests; they read cached aggregates
+    and are short. Bringing the search index and stats up to date can take
+    minutes, so that runs on an indexing thread with a connection of its
+    own, one update at a time. Rendering for the streaming endpoints runs
+    on worker threads, which never touch the index. Exports share the analyzer's
+    per-run state (the time windows of the selected sessions), so one runs
+    at a time and later ones wait for it.
+    """
+
+    def __init__(self, analyzer, dedup_min_bytes: Optional[int] = None):
+        self.analyzer = analyzer
+        self.dedup_min_bytes = dedup_min_bytes
+        self.search_index = SearchIndex(analyzer.index, analyzer.redactor)
+        self.generation = ""
+        self.refreshed = None
+        self.searchable = None
+        self.counted = None
+        self.indexer = ThreadPoolExecutor(max_workers=1)
+        self.index_conn = connect(check_same_thread=False)
+        self.responses: OrderedDict = OrderedDict()
+        self.export_lock = asyncio.Lock()
+        self.host = DEFAULT_HOST
+        self.port = DEFAULT_PORT
+        # Output also depends on how the server renders sessions
+        policy = analyzer.policy.digest if analyzer.policy else ""
+        self.seed = repr(
+            (
+                chat_converter.CONVERTER_VERSION,
+                analyzer.thread,
+                policy,
+                analyzer.redactor is not None,
+            )
+        )
+        self.routes: Dict[str, Callable] = {
+            "/": self.endpoints,
+            "/projects": self.projects,
+            "/sessions": self.sessions,
+            "/search": self.search,
+            "/stats/projects": self.stats,
+            "/stats/days": self.stats,
+        }
+
+    def refresh(self):
+        """Re-read the projects tree unless that was done moments ago"""
+        now = time.monotonic()
+        if self.refreshed is not None and now - self.refreshed < REFRESH_SECONDS:
+            return
+        self.analyzer.refresh()
+        self.generation = self.analyzer.index.generation()
+        self.refreshed = now
+
+    def etag(self, target: str, params: Dict[str, str]) -> str:
+        # A max_age window slides with the clock, not only with the manifest
+        minute = int(time.time() // 60) if params.get("max_age") else ""
+        canonical = f"{self.seed}\0{self.generation}\0{minute}\0{target}"
+        return f'"{hashlib.sha256(canonical.encode()).hexdigest()[:20]}"'
+
+    def allowed_host(self, header: Optional[str]) -> bool:
+        """Whether a Host header names this server rather than some other domain"""
+        if header is None:
+            return True  # HTTP/1.0 clients may leave it out; browsers never do
+        try:
+            url = urlsplit(f"//{header}")
+            port = url.port or 80
+        except ValueError:
+            return False
+        if port != self.port:
+            return False
+        if url.hostname in ("localhost", self.host.lower()):
+            return True
+        try:
+            ipaddress.ip_address(url.hostname or "")
+        except ValueError:
+            return False
+        return True
+
+    async def update_index(self, build: Callable) -> int:
+        """Run build(sessions).update() on the indexing thread; returns its count"""
+        sessions = self.analyzer.index
+        if in_memory(sessions.conn):
+            return build(sessions).update()  # No other connection can see it
+        snapshot = ManifestSnapshot(sessions, self.index_conn)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.indexer, lambda: build(snapshot).update()
+        )
+
+    def close(self):
+        self.indexer.shutdown()
+        self.index_conn.close()
+
+    def endpoints(self, path: str, params: Dict[str, str]) -> Dict:
+        return {"endpoints": ENDPOINTS, "roots": [str(r) for r in self.analyzer.roots]}
+
+    def projects(self, path: str, params: Dict[str, str]) -> Dict:
+        offset, limit = page_bounds(params)
+        # "latest" is relative to now and would go stale behind an ETag;
+        # latest_mtime carries the same information
+        rows = [
+            {key: value for key, value in info.items() if key != "latest"}
+            for info in self.analyzer.get_project_info()
+        ]
+        return page(
+            path, params, rows[offset : offset + limit], offset, limit, len(rows)
+        )
+
+    def sessions(self, path: str, params: Dict[str, str]) -> Dict:
+        offset, limit = page_bounds(params)
+        selected = None
+        if "project" in params:
+            selected, _ = self.analyzer.registry().select([params["project"]])
+            if not selected:
+                raise HttpError(
+                    HTTPStatus.NOT_FOUND, f"Project '{params['project']}' not found"
+                )
+
+        index = self.analyzer.index
+        rows = [(*row, False) for row in index.all_files()]
+        live = {str(row[0]) for row in rows}
+        rows += [
+            (*row, True)
+            for row in self.analyzer.bundles.members()
+            if str(row[0]) not in live
+        ]
+        sessions = sorted(
+            (
+                {
+                    "id": file.stem,
+                    "project": project,
+                    "name": unquote(project),
+                    "path": str(file),
+                    "size": size,
+                    "mtime": mtime,
+                    "archived": archived,
+                }
+                for file, project, size, mtime, archived in rows
+                if selected is None or project in selected
+            ),
+            key=lambda s: s["mtime"],
+            reverse=True,
+        )
+        return page(
+            path,
+            params,
+            sessions[offset : offset + limit],
+            offset,
+            limit,
+            len(sessions),
+        )
+
+    async def search(self, path: str, params: Dict[str, str]) -> Dict:
+        query = params.get("q", "").strip()
+        if not query:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "q is required")
+        offset, limit = page_bounds(params)
+        if self.searchable != self.generation:
+            generation = self.generation
+            added = await self.update_index(
+                lambda sessions: SearchIndex(sessions, self.analyzer.redactor)
+            )
+            if added:
+                print(f"Indexed {added} new messages")
+            self.searchable = generation
+        # One extra row tells whether there is a next page
+        results = self.search_index.search(query, limit + 1, offset)
+        return page(path, params, results, offset, limit, None)
+
+    async def stats(self, path: str, params: Dict[str, str]) -> Dict:
+        offset, limit = page_bounds(params)
+        project_names = None
+        if params.get("projects"):
+            project_names = [p.strip() for p in params["projects"].split(",")]
+        if self.counted != self.generation:
+            generation = self.generation
+            parsed = await self.update_index(SessionStats)
+            if parsed:
+                print(f"Parsed {parsed} new or changed sessions")
+            self.counted = generation
+        try:
+            rollups = self.analyzer.get_stats(
+                project_names, params.get("max_age"), update=False
+            )
+        except ValueError as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, str(e))
+        rows = rollups[path.rsplit("/", 1)[1]]
+        return page(
+            path, params, rows[offset : offset + limit], offset, limit, len(rows)
+        )
+
+    def session_markdown(self, session: str) -> Callable[[TextIO], None]:
+        """Renderer for one session by id; paths are not accepted"""
+        found = None
+        for file, _, _, _ in self.analyzer.index.all_files():
+            if file.stem == session:
+                found = file
+                break
+        if found is None:
+            bundled = self.analyzer.bundles.find(session)
+            if bundled is None:
+                raise HttpError(HTTPStatus.NOT_FOUND, f"Session '{session}' not found")
+            found = self.analyzer.bundles.extract(bundled)
+
+        def produce(out: TextIO):
+            if self.analyzer.redactor:
+                out = self.analyzer.redactor.wrap(out)
+            with contextlib.closing(out):
+                self.analyzer.render_session(found, out)
+
+        return produce
+
+    def export(self, params: Dict[str, str]) -> Callable[[TextIO], None]:
+        """Renderer for the packed archive of the selected sessions"""
+        if not params.get("projects") or not params.get("max_age"):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "projects and max_age are required")
+        project_names = [p.strip() for p in params["projects"].split(",")]
+        try:
+            files = list(self.analyzer.iter_files(project_names, params["max_age"]))
+        except ValueError as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, str(e))
+        if not files:
+            raise HttpError(HTTPStatus.NOT_FOUND, "No matching sessions")
+        entries = [self.analyzer.archive_entry(file) for file in files]
+
+        def produce(out: TextIO):
+            analyzer = self.analyzer
+            with ArchiveWriter(
+                None, None, self.dedup_min_bytes, analyzer.redactor, stream=out
+            ) as archive:
+                archive.write_header(entries)
+                for entry, file in zip(entries, files):
+                    error, _, _, md_path = analyzer.convert_file(file)
+                    if error:
+                        print(f"Warning: {error}")
+                        section = archive.begin(entry["name"])
+                        section.write(f"\n[conversion failed: {error}]\n")
+                    else:
+                        analyzer.pack_session(archive, entry["name"], file, md_path)
+            if analyzer.cache:
+                analyzer.cache.evict()
+
+        return produce
+
+    async def stream(
+        self,
+        writer: asyncio.StreamWriter,
+        produce: Callable[[TextIO], None],
+        chunked: bool,
+    ) -> int:
+        """Run produce on a worker thread, sending its output as it is written"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+        out = QueueWriter(loop, queue)
+
+        def run():
+            try:
+                produce(out)
+            except BrokenPipeError:
+                pass
+            except Exception as e:
+                # The status line is already sent; the body has to say it
+                print(f"Warning: Streaming failed: {e}")
+                with contextlib.suppress(BrokenPipeError):
+                    out.write(f"\n[export failed: {e}]\n")
+            finally:
+                with contextlib.suppress(BrokenPipeError):
+                    out.close()
+
+        task = loop.run_in_executor(None, run)
+        sent = 0
+        try:
+            while (chunk := await queue.get()) is not None:
+                writer.write(
+                    b"%x\r\n%s\r\n" % (len(chunk), chunk) if chunked else chunk
+                )
+                await writer.drain()
+                sent += len(chunk)
+            if chunked:
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # Unblock the worker if it waits on a full queue
+            out.gone = True
+            while not queue.empty():
+                queue.get_nowait()
+            raise
+        finally:
+            await task
+        return sent
+
+    async def respond(
+        self, method: str, target: str, headers: Dict[str, str], version: str, writer
+    ) -> Tuple[HTTPStatus, int, bool]:
+        """Answer one request; returns (status, body bytes, keep the connection)"""
+        keep_alive = version == "HTTP/1.1" and headers.get("connection") != "close"
+        if headers.get("content-length", "0") != "0":
+            keep_alive = False  # A body this server does not read
+        common = {"Connection": "keep-alive" if keep_alive else "close"}
+        try:
+            if not self.allowed_host(headers.get("host")):
+                raise HttpError(
+                    HTTPStatus.MISDIRECTED_REQUEST, "Host does not name this server"
+                )
+            if method not in ("GET", "HEAD"):
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "Read-only API")
+            url = urlsplit(target)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            path = url.path.rstrip("/") or "/"
+            is_session = path.startswith("/sessions/")
+            if path not in self.routes and path != "/export" and not is_session:
+                raise HttpError(HTTPStatus.NOT_FOUND, f"No endpoint {path}")
+
+            self.refresh()
+            etag = self.etag(target, params)
+            common.update({"ETag": f"W/{etag}", "Cache-Control": "no-cache"})
+            if etag in parse_etags(headers.get("if-none-match", "")):
+                send_head(writer, HTTPStatus.NOT_MODIFIED, common)
+                return HTTPStatus.NOT_MODIFIED, 0, keep_alive
+
+            if path in self.routes:
+                cached = self.responses.get(target)
+                if cached and cached[0] == etag:
+                    body = cached[1]
+                    self.responses.move_to_end(target)
+                else:
+                    data = self.routes[path](path, params)
+                    if asyncio.iscoroutine(data):
+                        data = await data
+                    body = json.dumps(data).encode("utf-8")
+                    self.responses[target] = (etag, body)
+                    if len(self.responses) > CACHED_RESPONSES:
+                        self.responses.popitem(last=False)
+                send_head(
+                    writer,
+                    HTTPStatus.OK,
+                    dict(
+                        common,
+                        **{
+                            "Content-Type": "application/json",
+                            "Content-Length": str(len(body)),
+                        },
+                    ),
+                )
+                if method == "GET":
+                    writer.write(body)
+                    await writer.drain()
+                return HTTPStatus.OK, len(body) if method == "GET" else 0, keep_alive
+
+            chunked = version == "HTTP/1.1"
+            keep_alive = keep_alive and chunked
+            common["Connection"] = "keep-alive" if keep_alive else "close"
+            stream_headers = dict(
+                common, **{"Content-Type": "text/markdown; charset=utf-8"}
+            )
+            if chunked:
+                stream_headers["Transfer-Encoding"] = "chunked"
+            if is_session:
+                produce = self.session_markdown(unquote(path.split("/", 2)[2]))
+                return await self._send_stream(
+                    writer, method, produce, stream_headers, chunked, keep_alive
+                )
+            async with self.export_lock:
+                produce = self.export(params)
+                timestamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+                stream_headers["Content-Disposition"] = (
+                    f'attachment; filename="claude-chats-{timestamp}.txt"'
+                )
+                stream_headers["Content-Type"] = "text/plain; charset=utf-8"
+                return await self._send_stream(
+                    writer, method, produce, stream_headers, chunked, keep_alive
+                )
+        except HttpError as e:
+            return await send_error(writer, e.status, str(e), common, keep_alive)
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            print(f"Warning: {method} {target} failed: {e}")
+            return await send_error(
+                writer, HTTPStatus.INTERNAL_SERVER_ERROR, str(e), common, False
+            )
+
+    async def _send_stream(
+        self, writer, method, produce, headers, chunked, keep_alive
+    ) -> Tuple[HTTPStatus, int, bool]:
+        send_head(writer, HTTPStatus.OK, headers)
+        if method == "HEAD":
+            await writer.drain()
+            return HTTPStatus.OK, 0, keep_alive
+        sent = await self.stream(writer, produce, chunked)
+        return HTTPStatus.OK, sent, keep_alive
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection until it closes or idles out"""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"), IDLE_SECONDS
+                    )
+                except (
+                    asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError,
+                    asyncio.TimeoutError,
+                    ConnectionError,
+                ):
+                    break
+                start = time.perf_counter()
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ")
+                except ValueError:
+                    await send_error(
+                        writer, HTTPStatus.BAD_REQUEST, "Malformed request", {}, False
+                    )
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+
+                status, sent, keep_alive = await self.respond(
+                    method, target, headers, version, writer
+                )
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                print(
+                    f"[{datetime.now():%H:%M:%S}] {method} {target} {status.value} "
+                    f"{format_bytes(sent)} ({elapsed_ms:.0f} ms)"
+                )
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+
+def send_head(writer: asyncio.StreamWriter, status: HTTPStatus, headers: Dict):
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+
+async def send_error(
+    writer: asyncio.StreamWriter,
+    status: HTTPStatus,
+    message: str,
+    headers: Dict,
+    keep_alive: bool,
+) -> Tuple[HTTPStatus, int, bool]:
+    body = json.dumps({"error": message}).encode("utf-8")
+    headers = dict(
+        headers,
+        **{
+            "Connection": "keep-alive" if keep_alive else "close",
+            "Content-Type": "application/json",
+            "Content-Length": str(len(body)),
+        },
+    )
+    send_head(writer, status, headers)
+    writer.write(body)
+    await writer.drain()
+    return status, len(body), keep_alive
+
+
+async def serve(analyzer, host: str, port: int, dedup_min_bytes: Optional[int] = None):
+    """Serve the API until cancelled"""
+    api = ApiServer(analyzer, dedup_min_bytes)
+    api.refresh()
+    server = await asyncio.start_server(api.handle, host, port, limit=MAX_HEADER_BYTES)
+    address = server.sockets[0].getsockname()
+    api.host, api.port = host, address[1]
+    print(f"🌐 Serving http://{address[0]}:{address[1]}/ (read-only), Ctrl+C to stop")
+    print(f"   Roots: {', '.join(map(str, analyzer.roots))}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        api.close()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""Split an export into numbered, self-describing shards with a shared manifest."""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from chat_dedup import BlockCounter
+from chat_packer import (
+    SUFFIXES,
+    TOC_END,
+    ArchiveWriter,
+    banner,
+    part_note,
+    preamble,
+    toc_line,
+)
+from chat_redact import SecretRedactor
+from chat_tokens import count_file, estimate_tokens
+
+UNITS = ("bytes", "tokens")
+# Numbers assumed when reserving room for headers whose counts are not known yet
+MAX_NUMBER = 99999
+
+
+def measure(md_path: Path, unit: str) -> int:
+    """Size of a converted session in bytes or estimated tokens"""
+    return md_path.stat().st_size if unit == "bytes" else count_file(md_path)
+
+
+def sections(md_path: Path) -> Iterator[Tuple[int, int, str]]:
+    """(start, end, text) of each message section; the title leads the first"""
+    start = pos = 0
+    lines = []
+    with open(md_path, "rb") as fp:
+        for line in fp:
+            if line.startswith(b"## ") and lines:
+                yield start, pos, b"".join(lines).decode("utf-8", "replace")
+                start, lines = pos, []
+            lines.append(line)
+            pos += len(line)
+    if lines:
+        yield start, pos, b"".join(lines).decode("utf-8", "replace")
+
+
+def split_session(
+    md_path: Path, limit: int, unit: str, counter: Optional[BlockCounter] = None
+) -> List[Tuple[int, int, int]]:
+    """Byte ranges (start, end, cost) cut before message headers
+
+    Each part stays within limit unless a single message is larger. With a
+    counter, each message is also charged what deduplication adds to it.
+    """
+    parts = []
+    part_start = part_end = part_cost = 0
+    for start, end, text in sections(md_path):
+        cost = cost_of(text, unit)
+        if counter:
+            charged = counter.charge
+            counter.write(text)
+            cost += counter.charge - charged
+        if part_cost and part_cost + cost > limit:
+            parts.append((part_start, part_end, part_cost))
+            part_start, part_cost = start, 0
+        part_end = end
+        part_cost += cost
+    if part_end > part_start:
+        parts.append((part_start, part_end, part_cost))
+    return parts
+
+
+def cost_of(text: str, unit: str) -> int:
+    return len(text.encode("utf-8")) if unit == "bytes" else estimate_tokens(text)
+
+
+def dedup_charge(md_path: Path, counter: Optional[BlockCounter]) -> int:
+    """What deduplication can add to a whole converted session"""
+    if counter is None:
+        return 0
+    with open(md_path, encoding="utf-8", errors="replace") as fp:
+        while chunk := fp.read(1 << 20):
+            counter.write(chunk)
+    counter.flush()
+    return counter.charge
+
+
+def part_name(name: str, part: Optional[Tuple[int, int]]) -> str:
+    return name if part is None else f"{name} (part {part[0]} of {part[1]})"
+
+
+def shard_reserve(unit: str) -> int:
+    """Cost of a shard's preamble and table of contents headings"""
+    return cost_of(preamble(MAX_NUMBER, (MAX_NUMBER, MAX_NUMBER)) + TOC_END, unit)
+
+
+def overhead(entry: Dict, part: Optional[Tuple[int, int]], unit: str) -> int:
+    """Cost of the table of contents line and banner a piece adds to its shard"""
+    name = part_name(entry["name"], part)
+    text = toc_line(MAX_NUMBER, dict(entry, name=name)) + banner(name)
+    return cost_of(text + (part_note(part) if part else ""), unit)
+
+
+def plan_shards(
+    converted: List[Tuple[Path, Path]],
+    entry: Callable[[Path], Dict],
+    limit: int,
+    unit: str,
+    dedup_min_bytes: Optional[int] = None,
+) -> List[List[Dict]]:
+    """Fill shards in order; a session is split only if it alone exceeds limit
+
+    Each piece is charged its table of contents line and banner, and with
+    dedup_min_bytes the markers and references deduplication may add to its
+    large blocks. Every shard reserves room for its preamble, so a shard
+    stays within limit unless a single message is larger.
+    """
+    reserve = shard_reserve(unit)
+    room = max(1, limit - reserve)
+    bases = [
+        {"file": file, "md_path": md_path, "entry": entry(file)}
+        for file, md_path in converted
+    ]
+    # References name the session a block was first shown in; assume the longest
+    first = max(
+        (part_name(b["entry"]["name"], (MAX_NUMBER, MAX_NUMBER)) for b in bases),
+        key=len,
+        default="",
+    )
+
+    def counter() -> Optional[BlockCounter]:
+        if not dedup_min_bytes:
+            return None
+        return BlockCounter(dedup_min_bytes, first, lambda text: cost_of(text, unit))
+
+    pieces = []
+    for base in bases:
+        md_path = base["md_path"]
+        cost = (
+            measure(md_path, unit)
+            + overhead(base["entry"], None, unit)
+            + dedup_charge(md_path, counter())
+        )
+        if cost <= room:
+            pieces.append(dict(base, cost=cost, range=None))
+            continue
+        worst = overhead(base["entry"], (MAX_NUMBER, MAX_NUMBER), unit)
+        parts = split_session(md_path, max(1, room - worst), unit, counter())
+        for i, (start, end, part_cost) in enumerate(parts, 1):
+            part = (i, len(parts))
+            pieces.append(
+                dict(
+                    base,
+                    cost=part_cost + overhead(base["entry"], part, unit),
+                    range=(start, end),
+                    part=part,
+                )
+            )
+
+    shards = [[]]
+    filled = 0
+    for piece in pieces:
+        if shards[-1] and filled + piece["cost"] > room:
+            shards.append([])
+            filled = 0
+        shards[-1].append(piece)
+        filled += piece["cost"]
+    return shards
+
+
+def piece_name(piece: Dict) -> str:
+    return part_name(piece["entry"]["name"], piece.get("part"))
+
+
+def write_shards(
+    shards: List[List[Dict]],
+    output_dir: Path,
+    unit: str,
+    limit: int,
+    compression: Optional[str] = None,
+    dedup_min_bytes: Optional[int] = None,
+    redactor: Optional[SecretRedactor] = None,
+) -> Dict:
+    """Write every shard concurrently, then manifest.json; returns the manifest
+
+    Each shard has its own table of contents and deduplicates only within
+    itself, so it can be read without the others.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    total = len(shards)
+    reserve = shard_reserve(unit)
+
+    def write(number: int, pieces: List[Dict]) -> Dict:
+        path = output_dir / f"shard-{number:03d}-of-{total:03d}{SUFFIXES[compression]}"
+        entries = [dict(p["entry"], name=piece_name(p)) for p in pieces]
+        with ArchiveWriter(path, compression, dedup_min_bytes, redactor) as archive:
+            archive.write_header(entries, shard=(number, total))
+            for piece, entry in zip(pieces, entries):
+                if piece["range"] is None:
+                    archive.add_file(entry["name"], piece["md_path"])
+                else:
+                    archive.add_range(
+                        entry["name"], piece["md_path"], *piece["range"], piece["part"]
+                    )
+        return {
+            "file": path.name,
+            "bytes": path.stat().st_size,
+            # Planned size in the limit's unit, before dedup and compression
+            "cost": {unit: reserve + sum(p["cost"] for p in pieces)},
+            "sessions": [entry["name"] for entry in entries],
+            "duplicates": archive.dedup.duplicates if archive.dedup else 0,
+            "saved_bytes": archive.dedup.saved_bytes if archive.dedup else 0,
+        }
+
+    workers = min(total, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        written = list(pool.map(write, range(1, total + 1), shards))
+
+    manifest = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "limit": {unit: limit},
+        "compression": compression,
+        "shards": written,
+    }
+    with open(output_dir / "manifest.json", "w", encoding="utf-8") as fp:
+        json.dump(manifest, fp, indent=2)
+    return manifest
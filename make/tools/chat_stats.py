@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Usage analytics over Claude sessions with cached per-file aggregates."""
+
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from chat_converter import read_complete
+from chat_index import (
+    COMMIT_SECONDS,
+    MergedIndex,
+    add_root_column,
+    boundary_hash,
+    resume_point,
+    root_of,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_stats (
+    path TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    boundary TEXT NOT NULL,
+    first_ts TEXT NOT NULL,
+    last_ts TEXT NOT NULL,
+    last_message_id TEXT NOT NULL,
+    days TEXT NOT NULL
+);
+"""
+
+USAGE_FIELDS = {
+    "input_tokens": "input_tokens",
+    "output_tokens": "output_tokens",
+    "cache_read_input_tokens": "cache_read_tokens",
+    "cache_creation_input_tokens": "cache_creation_tokens",
+}
+COUNTERS = ["user_messages", "assistant_messages", "tool_calls"] + list(
+    USAGE_FIELDS.values()
+)
+
+
+def empty_counts() -> Dict:
+    counts = dict.fromkeys(COUNTERS, 0)
+    counts["tools"] = {}
+    return counts
+
+
+def merge_counts(into: Dict, other: Dict):
+    """Add one set of counters (and per-tool counts) into another"""
+    for name in COUNTERS:
+        into[name] += other.get(name, 0)
+    for tool, n in other.get("tools", {}).items():
+        into["tools"][tool] = into["tools"].get(tool, 0) + n
+
+
+def duration_seconds(first_ts: str, last_ts: str) -> float:
+    """Seconds between two ISO timestamps, 0 if either is missing or invalid"""
+    try:
+        first = datetime.fromisoformat(first_ts.replace("Z", "+00:00"))
+        last = datetime.fromisoformat(last_ts.replace("Z", "+00:00"))
+    except ValueError:
+        return 0.0
+    return max(0.0, (last - first).total_seconds())
+
+
+class FileAggregate:
+    """Per-day counters for one session, extendable with appended records"""
+
+    def __init__(self, first_ts="", last_ts="", last_message_id="", days=None):
+        self.first_ts = first_ts
+        self.last_ts = last_ts
+        self.last_message_id = last_message_id
+        self.days = days or {}
+
+    def add(self, record: Dict):
+        kind = record.get("type")
+        if kind not in ("user", "assistant"):
+            return
+        timestamp = record.get("timestamp") or ""
+        if timestamp:
+            self.first_ts = min(self.first_ts or timestamp, timestamp)
+            self.last_ts = max(self.last_ts, timestamp)
+        counts = self.days.setdefault(timestamp[:10] or "unknown", empty_counts())
+
+        message = record.get("message") or {}
+        content = message.get("content")
+        blocks = []
+        if isinstance(content, list):
+            blocks = [b for b in content if isinstance(b, dict)]
+
+        if kind == "user":
+            # Tool results come back as user records; they are not prompts
+            if not blocks or any(b.get("type") != "tool_result" for b in blocks):
+                counts["user_messages"] += 1
+            return
+
+        for block in blocks:
+            if block.get("type") == "tool_use":
+                name = block.get("name", "unknown")
+                counts["tool_calls"] += 1
+                counts["tools"][name] = counts["tools"].get(name, 0) + 1
+
+        # One API response is logged as several records sharing its id and
+        # usage, so count each response once
+        message_id = message.get("id") or record.get("uuid", "")
+        if message_id == self.last_message_id:
+            return
+        self.last_message_id = message_id
+        counts["assistant_messages"] += 1
+        usage = message.get("usage") or {}
+        for field, name in USAGE_FIELDS.items():
+            counts[name] += usage.get(field) or 0
+
+
+class SessionStats:
+    """Single streaming pass over sessions; only changed files are re-read
+
+    Aggregates are kept per projects root, so a run over other roots neither
+    counts nor forgets them.
+    """
+
+    def __init__(self, sessions: MergedIndex):
+        self.sessions = sessions
+        self.conn = sessions.conn
+        self.conn.executescript(SCHEMA)
+        add_root_column(self.conn, "file_stats")
+
+    def update(self) -> int:
+        """Fold appended records into the cached aggregates; returns files read"""
+        cached = {
+            row[0]: row[1:]
+            for row in self.conn.execute(
+                "SELECT path, root, offset, boundary, first_ts, last_ts, "
+                "last_message_id, days FROM file_stats"
+            )
+        }
+        parsed = 0
+        live = set()
+
+        committed = time.monotonic()
+        for path, project, size, _ in self.sessions.all_files():
+            key = str(path)
+            live.add(key)
+            _, offset, boundary, *state = cached.get(key, ("", 0, "", "", "", "", "{}"))
+            try:
+                start = resume_point(path, size, offset, boundary)
+                if start is None:
+                    continue
+                if start == 0:
+                    state = ("", "", "", "{}")
+                self._read_file(path, project, start, state)
+                parsed += 1
+                # Short transactions leave the manifest writable meanwhile
+                if time.monotonic() - committed > COMMIT_SECONDS:
+                    self.conn.commit()
+                    committed = time.monotonic()
+            except FileNotFoundError:
+                continue
+
+        roots = set(self.sessions.roots)
+        archived = self.sessions.archived()
+        stale = [
+            (key,)
+            for key, (root, *_) in cached.items()
+            if root in roots and key not in live and key not in archived
+        ]
+        self.conn.executemany("DELETE FROM file_stats WHERE path = ?", stale)
+        self.conn.commit()
+        return parsed
+
+    def _read_file(self, path: Path, project: str, offset: int, state):
+        first_ts, last_ts, last_message_id, days = state
+        aggregate = FileAggregate(first_ts, last_ts, last_message_id, json.loads(days))
+        with open(path, "rb") as fp:
+            fp.seek(offset)
+            for length, record in read_complete(fp):
+                offset += length
+                if record is not None:
+                    aggregate.add(record)
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO file_stats (path, project, offset, boundary, "
+            "first_ts, last_ts, last_message_id, days, root) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                str(path),
+                project,
+                offset,
+                boundary_hash(path, offset),
+                aggregate.first_ts,
+                aggregate.last_ts,
+                aggregate.last_message_id,
+                json.dumps(aggregate.days),
+                root_of(path),
+            ),
+        )
+
+    def rollups(
+        self, projects: Optional[List[str]] = None, since: Optional[str] = None
+    ) -> Dict[str, List[Dict]]:
+        """Per-project and per-day totals from the cached aggregates
+
+        projects limits the rollup to those encoded project names and since
+        (YYYY-MM-DD, UTC) to days on or after it.
+        """
+        by_project = {}
+        by_day = {}
+        roots = self.sessions.roots
+        for path, project, first_ts, last_ts, days in self.conn.execute(
+            "SELECT path, project, first_ts, last_ts, days FROM file_stats "
+            f"WHERE root IN ({', '.join('?' * len(roots))})",
+            roots,
+        ):
+            if projects is not None and project not in projects:
+                continue
+            days = {
+                day: counts
+                for day, counts in json.loads(days).items()
+                if since is None or (day != "unknown" and day >= since)
+            }
+            if not days:
+                continue
+
+            totals = by_project.setdefault(
+                project,
+                dict(empty_counts(), project=project, sessions=0, duration=0.0),
+            )
+            totals["sessions"] += 1
+            totals["duration"] += duration_seconds(first_ts, last_ts)
+            for day, counts in days.items():
+                merge_counts(totals, counts)
+                day_totals = by_day.setdefault(
+                    day, dict(empty_counts(), day=day, sessions=0)
+                )
+                day_totals["sessions"] += 1
+                merge_counts(day_totals, counts)
+
+        return {
+            "projects": sorted(
+                by_project.values(), key=lambda p: p["assistant_messages"], reverse=True
+            ),
+            "days": sorted(by_day.values(), key=lambda d: d["day"]),
+        }
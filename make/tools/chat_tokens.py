@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Fast local token estimates for sizing exports against a model's context."""
+
+import math
+import re
+from pathlib import Path
+
+# Typical for English prose and code with Claude-family tokenizers; the word
+# rate keeps whitespace-heavy logs and short identifiers from being undercounted
+CHARS_PER_TOKEN = 3.8
+TOKENS_PER_WORD = 1.3
+CHUNK_CHARS = 1 << 20
+# Below this, a truncated session is mostly noise; skip it instead
+MIN_TRUNCATED_TOKENS = 1000
+
+WORD = re.compile(r"\S+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of text without a tokenizer"""
+    words = sum(1 for _ in WORD.finditer(text))
+    return math.ceil(max(len(text) / CHARS_PER_TOKEN, words * TOKENS_PER_WORD))
+
+
+def chars_for_tokens(tokens: int) -> int:
+    """Roughly how many characters fit in a token budget"""
+    return int(tokens * CHARS_PER_TOKEN)
+
+
+def count_file(path: Path) -> int:
+    """Estimate the tokens in a text file, reading it in chunks"""
+    tokens = 0
+    carry = ""
+    with open(path, encoding="utf-8", errors="replace") as fp:
+        while chunk := fp.read(CHUNK_CHARS):
+            # Hold back a trailing partial word so it is not split across chunks
+            head, sep, carry = (carry + chunk).rpartition(" ")
+            tokens += estimate_tokens(head + sep)
+    return tokens + estimate_tokens(carry)
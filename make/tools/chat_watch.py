@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Change notifications for ~/.claude/projects: inotify on Linux, polling elsewhere."""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Set, Tuple
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+
+ROOT_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+PROJECT_MASK = ROOT_MASK | IN_MODIFY | IN_CLOSE_WRITE
+EVENT = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Blocks in select() on an inotify descriptor, so idle CPU is zero"""
+
+    kind = "inotify"
+
+    def __init__(self, projects_dir: Path):
+        self.projects_dir = projects_dir
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs: Dict[int, Path] = {}
+        self._add(projects_dir, ROOT_MASK)
+        for entry in os.scandir(projects_dir):
+            if entry.is_dir():
+                self._add(Path(entry.path), PROJECT_MASK)
+
+    def _add(self, path: Path, mask: int):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd >= 0:
+            self.dirs[wd] = path
+
+    def wait(self, timeout: float = None) -> Set[Path]:
+        """Changed paths after up to timeout seconds; {projects_dir} on overflow"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            name = data[offset + EVENT.size : offset + EVENT.size + length]
+            offset += EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                changed.add(self.projects_dir)
+                continue
+            parent = self.dirs.get(wd)
+            if parent is None:
+                continue
+            path = parent / os.fsdecode(name.rstrip(b"\0"))
+            if parent == self.projects_dir and mask & IN_ISDIR and mask & IN_CREATE:
+                self._add(path, PROJECT_MASK)
+            changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback that compares (size, mtime) of every session each interval"""
+
+    kind = "polling"
+
+    def __init__(self, projects_dir: Path, interval: float = 5.0):
+        self.projects_dir = projects_dir
+        self.interval = interval
+        self.seen = self._snapshot()
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        try:
+            projects = list(os.scandir(self.projects_dir))
+        except FileNotFoundError:
+            return snapshot
+        for project in projects:
+            if not project.is_dir():
+                continue
+            for entry in os.scandir(project.path):
+                if entry.name.endswith(".jsonl"):
+                    st = entry.stat()
+                    snapshot[Path(entry.path)] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout: float = None) -> Set[Path]:
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        current = self._snapshot()
+        changed = {
+            path
+            for path in current.keys() | self.seen.keys()
+            if current.get(path) != self.seen.get(path)
+        }
+        self.seen = current
+        return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(projects_dir: Path, poll_interval: float = 5.0):
+    """inotify where the platform has it, polling otherwise"""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(projects_dir)
+        except (OSError, AttributeError, TypeError):
+            pass
+    return PollingWatcher(projects_dir, poll_interval)
+
+
+def watch(
+    watcher,
+    on_change: Callable[[Set[Path]], None],
+    debounce: float = 1.0,
+    max_delay: float = 10.0,
+):
+    """Call on_change with batches of changed paths until interrupted
+
+    A batch is flushed once no new event arrived for debounce seconds, or
+    max_delay after its first event while Claude is streaming a long reply.
+    """
+    try:
+        while True:
+            batch = watcher.wait()
+            if not batch:
+                continue
+            first = time.monotonic()
+            while time.monotonic() - first < max_delay:
+                more = watcher.wait(debounce)
+                if not more:
+                    break
+                batch |= more
+            on_change(batch)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
@@ -8,22 +8,93 @@ Usage:
 
     # Processing mode - analyze specific projects
     python claude_chat_analyzer.py --projects "ai-coach-research,other-project" --max-age 2d
+
+    # Select projects by pattern, or all of them
+    python claude_chat_analyzer.py --projects "client-*" --max-age 1w
+    python claude_chat_analyzer.py --all --max-age 1d
+
+    # Merge projects trees rsync'ed from several machines
+    python claude_chat_analyzer.py --root ~/sync/laptop --root ~/sync/desktop
+
+    # Read-only JSON API for dashboards on http://127.0.0.1:8765/
+    python claude_chat_analyzer.py --serve
 """
 
 import argparse
-import os
+import asyncio
+import contextlib
+import json
 import sys
 import subprocess
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from urllib.parse import unquote
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional, TextIO, Tuple
+
+import chat_converter
+from chat_bundle import ARCHIVE_DIR, BundleStore
+from chat_cache import DEFAULT_CACHE_MB, ConversionCache
+from chat_dedup import DEFAULT_MIN_BYTES
+from chat_elide import ElisionPolicy, Elider, format_bytes
+from chat_graph import THREADS, SessionGraph, convert_thread
+from chat_index import SCAN_WORKERS, MergedIndex, ProjectRegistry
+from chat_packer import SUFFIXES, ArchiveWriter
+from chat_pool import RenderPool
+from chat_profile import Profiler
+from chat_redact import SecretRedactor
+from chat_reader import (
+    SessionReader,
+    TimeRanges,
+    convert_slice,
+    drop_line_indexes,
+    parse_timestamp,
+)
+from chat_search import SearchIndex
+from chat_serve import DEFAULT_HOST, DEFAULT_PORT, serve
+from chat_shards import plan_shards, write_shards
+from chat_stats import SessionStats
+from chat_watch import make_watcher, watch
+from chat_tokens import MIN_TRUNCATED_TOKENS, chars_for_tokens, count_file
 
 
 class ChatAnalyzer:
-    def __init__(self):
-        self.projects_dir = Path.home() / ".claude" / "projects"
+    def __init__(
+        self,
+        rescan: bool = False,
+        converter: str = "native",
+        cache_mb: int = DEFAULT_CACHE_MB,
+        thread: str = "all",
+        elide_policy: Optional[ElisionPolicy] = None,
+        roots: Optional[List[Path]] = None,
+        profiler: Optional[Profiler] = None,
+        scan_workers: int = SCAN_WORKERS,
+        archive_dir: Path = ARCHIVE_DIR,
+        redactor: Optional[SecretRedactor] = None,
+    ):
+        # Several roots hold projects trees synced from different machines
+        self.roots = roots or [Path.home() / ".claude" / "projects"]
+        self.projects_dir = self.roots[0]
+        self.index = MergedIndex(
+            self.roots, workers=scan_workers, on_drop=drop_line_indexes
+        )
+        self.bundles = BundleStore(self.index.conn, archive_dir, roots=self.index.roots)
+        self._registry = None
+        self.rescan = rescan
+        self.converter = converter
+        # Which records of each session to export: all, main or sidechains
+        self.thread = thread
+        self.policy = elide_policy
+        # Scrubs API keys and tokens from everything written to an export
+        self.redactor = redactor
+        self.profiler = profiler
+        self.cache = ConversionCache(cache_mb * 1024 * 1024) if cache_mb > 0 else None
+        # Sessions to export only from this epoch time on, set by iter_files
+        self.windows: Dict[Path, float] = {}
+        # Worker processes for native renders while a --jobs export runs
+        self.pool: Optional[RenderPool] = None
 
     def parse_age(self, age_str: str) -> timedelta:
         """Convert age string (1h, 2d, 1w) to timedelta"""
@@ -67,162 +138,836 @@ class ChatAnalyzer:
         else:
             return "just now"
 
-    def get_project_info(self) -> List[Dict]:
-        """Scan projects directory and return info for each"""
-        projects = []
+    def profile(self, stage: str):
+        """Time a stage of this run when profiling is on"""
+        return self.profiler.stage(stage) if self.profiler else contextlib.nullcontext()
+
+    def registry(self) -> ProjectRegistry:
+        """Project registry for this run, built from a single index refresh"""
+        if self._registry is None:
+            with self.profile("scan"):
+                self.index.refresh(full=self.rescan)
+                drop_line_indexes(self.bundles.prune())
+            self.rescan = False
+            self._registry = ProjectRegistry(self.index.projects())
+        return self._registry
+
+    def refresh(self) -> ProjectRegistry:
+        """Re-read the projects tree; later registry() calls see the result"""
+        self._registry = None
+        return self.registry()
+
+    def select_projects(self, selectors: List[str]) -> List[str]:
+        """Encoded names of the projects matching names, globs or re: patterns"""
+        selected, unmatched = self.registry().select(selectors)
+        for selector in unmatched:
+            print(f"Warning: Project '{selector}' not found")
+        return selected
 
-        if not self.projects_dir.exists():
-            return projects
-
-        for project_path in self.projects_dir.iterdir():
-            if not project_path.is_dir():
-                continue
-
-            # Decode project name
-            encoded_name = project_path.name
-            decoded_name = unquote(encoded_name)
+    def get_project_info(self) -> List[Dict]:
+        """Return info for each project, sorted by latest activity"""
+        return [
+            {
+                "name": unquote(row["path"]),
+                "path": row["path"],
+                "files": row["files"],
+                "latest": self.format_age(row["latest_mtime"]),
+                "latest_mtime": row["latest_mtime"],
+                "size_mb": row["size"] / (1024 * 1024),
+                "roots": row["roots"],
+                "archived": row["archived"],
+            }
+            for row in self.registry().rows
+        ]
 
-            # Get .jsonl files
-            jsonl_files = list(project_path.glob("*.jsonl"))
-            if not jsonl_files:
-                continue
+    def filter_files(self, project_names: List[str], max_age_str: str) -> List[Path]:
+        """Sessions of these projects with messages newer than max_age"""
+        return list(self.iter_files(project_names, max_age_str))
+
+    def iter_files(self, project_names: List[str], max_age_str: str) -> Iterator[Path]:
+        """Yield sessions of these projects with messages newer than max_age
+
+        project_names may hold globs and re: patterns (see ProjectRegistry).
+        Files last written before the cutoff are skipped from the manifest
+        alone and the rest by their cached message time range, so neither is
+        opened. Sessions that also hold older messages are recorded in
+        self.windows and exported from the cutoff on.
+        """
+        max_age = self.parse_age(max_age_str)
+        cutoff = (datetime.now(timezone.utc) - max_age).timestamp()
+        projects = self.select_projects(project_names)
 
-            # Calculate stats
-            file_count = len(jsonl_files)
-            total_size = sum(f.stat().st_size for f in jsonl_files)
-            size_mb = total_size / (1024 * 1024)
+        ranges = TimeRanges(self.index)
+        self.windows = {}
 
-            # Find latest file
-            latest_file = max(jsonl_files, key=lambda f: f.stat().st_mtime)
-            latest_age = self.format_age(latest_file.stat().st_mtime)
+        for project in projects:
+            with self.profile("filter"):
+                recent = [f for f in self.index.files(project) if f[2] >= cutoff]
+                # Bundled sessions are read from a copy of their member
+                for path, _, size, mtime in self.bundles.members([project]):
+                    if mtime >= cutoff:
+                        recent.append((self.bundles.extract(path), size, mtime))
+                # Committed per project, so the cache's writers are never blocked
+                project_ranges = ranges.ranges(recent)
+            for jsonl_file, (first, last) in project_ranges.items():
+                if last is not None and last < cutoff:
+                    continue
+                if first is not None and first < cutoff:
+                    self.windows[jsonl_file] = cutoff
+                yield jsonl_file
 
-            projects.append(
-                {
-                    "name": decoded_name,
-                    "path": encoded_name,
-                    "files": file_count,
-                    "latest": latest_age,
-                    "size_mb": size_mb,
-                }
+        if self.windows:
+            print(
+                f"{len(self.windows)} sessions started before the cutoff; "
+                "exporting only their recent messages"
             )
 
-        # Sort by latest activity - need to parse the age string for proper sorting
-        def age_to_seconds(age_str):
-            """Convert age string back to approximate seconds for sorting"""
-            if "just now" in age_str:
-                return 0
-            elif "minute" in age_str:
-                minutes = int(age_str.split()[0])
-                return minutes * 60
-            elif "hour" in age_str:
-                hours = int(age_str.split()[0])
-                return hours * 3600
-            elif "day" in age_str:
-                days = int(age_str.split()[0])
-                return days * 86400
-            elif "week" in age_str:
-                weeks = int(age_str.split()[0])
-                return weeks * 604800
-            return float("inf")  # Unknown format, put at end
-
-        projects.sort(key=lambda p: age_to_seconds(p["latest"]))
-
-        return projects
-
-    def filter_files(self, project_names: List[str], max_age_str: str) -> List[Path]:
-        """Filter .jsonl files by project and age"""
-        max_age = self.parse_age(max_age_str)
-        cutoff_time = datetime.now() - max_age
-
-        # Get all projects to build name mapping
-        all_projects = self.get_project_info()
-        name_to_path = {p["name"]: p["path"] for p in all_projects}
+    def convert_file(
+        self, file: Path, scratch: Optional[Path] = None
+    ) -> Tuple[Optional[str], float, str, Optional[Path]]:
+        """Convert one session to Markdown
+
+        Returns (error, wall time, status, markdown path). status is
+        "converted", "cached" (unchanged since the last run), "appended" (only
+        records added since the last run were rendered), "sliced" (only the
+        records in the session's time window were rendered) or "inline" (no
+        cache; the session is rendered straight into the archive while packing).
+        """
+        start = time.perf_counter()
+        status = "converted"
+        md_path = None
+        with self.profile("convert"):
+            try:
+                if file in self.windows:
+                    # Slices are cheap to cut from the line index and never cached
+                    status = "sliced" if scratch else "inline"
+                    if scratch:
+                        md_path = scratch / f"{file.stem}.md"
+                        with open(md_path, "w", encoding="utf-8") as out:
+                            if self.pool:
+                                self.pool.slice(file, out, self.windows[file])
+                            else:
+                                convert_slice(
+                                    file,
+                                    out,
+                                    self.windows[file],
+                                    thread=self.thread,
+                                    elider=self.elider(),
+                                )
+                elif self.converter == "claude2md":
+                    output_dir = scratch / file.stem
+                    output_dir.mkdir()
+                    with self.profile("claude2md"):
+                        subprocess.run(
+                            ["claude2md", str(file), str(output_dir)],
+                            capture_output=True,
+                            text=True,
+                            check=True,
+                        )
+                    md_path = next(output_dir.glob("*.md"), None)
+                    if md_path is None:
+                        raise RuntimeError("claude2md produced no Markdown")
+                elif self.cache is None and scratch is None:
+                    status = "inline"
+                elif self.cache is None:
+                    md_path = scratch / f"{file.stem}.md"
+                    render = self.pool.render if self.pool else self.render_session
+                    with open(md_path, "w", encoding="utf-8") as out:
+                        render(file, out)
+                else:
+                    version = f"native-{chat_converter.CONVERTER_VERSION}"
+                    if self.thread != "all":
+                        version += f"-{self.thread}"
+                    if self.policy:
+                        version += f"-elide-{self.policy.digest}"
+                    extendable = self.thread == "all" and not self.policy
+                    if self.pool:
+                        render = self.pool.render
+                    elif extendable:
+                        render = chat_converter.convert_session
+                    else:
+                        render = self.render_session
+                    md_path = self.cache.lookup(file, version)
+                    if md_path:
+                        status = "cached"
+                    else:
+                        # A new record can move the main thread to another branch,
+                        # and results are elided by the tool that made the call,
+                        # which may sit before the resume point; such renders are
+                        # never extended
+                        if extendable:
+                            md_path = self.cache.extend(file, version, render)
+                        if md_path:
+                            status = "appended"
+                        else:
+                            md_path = self.cache.store(file, version, render)
+                error = None
+            except subprocess.CalledProcessError as e:
+                error = f"Failed to convert {file.name}: {e.stderr}"
+            except Exception as e:
+                error = f"Error converting {file.name}: {e}"
+        elapsed = time.perf_counter() - start
+        if self.profiler:
+            size = file.stat().st_size if file.exists() else 0
+            self.profiler.record_file(elapsed, "failed" if error else status, size)
+        return error, elapsed, status, md_path
+
+    def start_pool(self, stack: contextlib.ExitStack, jobs: int):
+        """Render natively in jobs worker processes until stack is closed"""
+        if self.converter != "native" or jobs < 2:
+            return
+        self.pool = stack.enter_context(RenderPool(jobs, self.thread, self.policy))
+        stack.callback(setattr, self, "pool", None)
+
+    def render_session(
+        self, file: Path, out: TextIO, offset: int = 0
+    ) -> Tuple[int, int]:
+        """Render the selected thread of file; a cache Renderer when offset is 0"""
+        if self.thread == "all":
+            return chat_converter.convert_session(file, out, offset, self.elider())
+        return convert_thread(file, out, self.thread, self.elider())
+
+    def elider(self) -> Optional[Elider]:
+        """Fresh per-session state for the elision policy, if one is set"""
+        return self.policy.session() if self.policy else None
+
+    def archive_entry(self, file: Path) -> Dict:
+        """Table of contents entry for one session"""
+        st = file.stat()
+        return {
+            "name": f"{unquote(file.parent.name)}/{file.stem}.md",
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+        }
+
+    def apply_budget(
+        self, converted: List[Tuple[Path, Path]], max_tokens: int
+    ) -> List[Tuple[Path, Path, Optional[int]]]:
+        """Fill a token budget newest-first, truncating or skipping older sessions
+
+        Returns (file, markdown, max chars or None for whole) in input order.
+        """
+        newest_first = sorted(
+            converted, key=lambda c: c[0].stat().st_mtime, reverse=True
+        )
+        remaining = max_tokens
+        limits = {}
+
+        print(f"\n🧮 TOKEN BUDGET ({max_tokens:,} tokens, newest first):")
+        print(f"{'Tokens':>10}  {'Kept':>10}  {'Status':<9}  Session")
+        print("-" * 80)
+        for file, md_path in newest_first:
+            tokens = count_file(md_path)
+            if tokens <= remaining:
+                limits[file] = None
+                kept, status = tokens, "full"
+            elif remaining >= MIN_TRUNCATED_TOKENS:
+                limits[file] = chars_for_tokens(remaining)
+                kept, status = remaining, "truncated"
+            else:
+                kept, status = 0, "skipped"
+            remaining -= kept
+            name = f"{unquote(file.parent.name)}/{file.stem}"
+            print(f"{tokens:>10,}  {kept:>10,}  {status:<9}  {name}")
+        print(f"Estimated total: {max_tokens - remaining:,} tokens")
+
+        return [(f, md, limits[f]) for f, md in converted if f in limits]
+
+    def report_conversion(self, file: Path, result: Tuple, tally: Dict) -> bool:
+        """Print one conversion outcome and count it; False if it failed"""
+        error, elapsed, status, _ = result
+        if error:
+            print(f"Warning: {error}")
+            return False
+        tally["converted"] += 1
+        if status == "cached":
+            print(f"Reused {file.name} (cached)")
+            tally["cached"] += 1
+        elif status != "inline":
+            verb = {"appended": "Updated", "sliced": "Sliced"}.get(status, "Converted")
+            print(f"{verb} {file.name} ({elapsed:.2f}s)")
+            tally["timings"].append((elapsed, file.name))
+        return True
+
+    def print_conversion_summary(self, total: int, tally: Dict):
+        print(f"\nConverted {tally['converted']}/{total} files")
+        if tally["cached"]:
+            print(f"   {tally['cached']} reused from cache")
+        if len(tally["timings"]) > 1:
+            print("Slowest conversions:")
+            for elapsed, name in sorted(tally["timings"], reverse=True)[:3]:
+                print(f"   {elapsed:6.2f}s  {name}")
+
+    def output_path(self, compression: Optional[str]) -> Path:
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        return Path(f"/tmp/claude-chats-{timestamp}{SUFFIXES[compression]}")
+
+    def pack_session(
+        self,
+        archive: ArchiveWriter,
+        name: str,
+        file: Path,
+        md_path: Optional[Path],
+        limit: Optional[int] = None,
+    ):
+        """Write one session into the archive, rendering it inline if needed"""
+        with self.profile("pack"):
+            self._pack_session(archive, name, file, md_path, limit)
+
+    def _pack_session(
+        self,
+        archive: ArchiveWriter,
+        name: str,
+        file: Path,
+        md_path: Optional[Path],
+        limit: Optional[int],
+    ):
+        try:
+            if limit is not None:
+                archive.add_tail(name, md_path, limit)
+                return
+            if md_path is not None:
+                archive.add_file(name, md_path)
+                return
+        except FileNotFoundError:
+            # Evicted by a concurrent run since it was converted
+            print(f"Warning: Cached conversion of {file.name} is gone; rendering it")
+        out = archive.begin(name)
+        try:
+            if file in self.windows:
+                convert_slice(
+                    file,
+                    out,
+                    self.windows[file],
+                    thread=self.thread,
+                    elider=self.elider(),
+                )
+            else:
+                self.render_session(file, out)
+        except Exception as e:
+            print(f"Warning: Error converting {file.name}: {e}")
+            out.write(f"\n[conversion failed: {e}]\n")
 
-        filtered_files = []
+    def write_header(self, archive: ArchiveWriter, entries: List[Dict]):
+        with self.profile("pack"):
+            archive.write_header(entries)
 
-        for project_name in project_names:
-            if project_name not in name_to_path:
-                print(f"Warning: Project '{project_name}' not found")
-                continue
+    def finish_archive(self, archive: ArchiveWriter):
+        if archive.dedup and archive.dedup.duplicates:
+            print(
+                f"♻️  Replaced {archive.dedup.duplicates} repeated blocks with "
+                f"references, saving {archive.dedup.saved_bytes / 1024:.1f} KB"
+            )
+        self.report_filters()
+
+        # Evict only after packing so this run's entries are not dropped
+        if self.cache:
+            self.cache.evict()
+
+    def process_files(
+        self,
+        files: List[Path],
+        jobs: int = 1,
+        compression: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        dedup_min_bytes: Optional[int] = DEFAULT_MIN_BYTES,
+        shard: Optional[Tuple[str, int]] = None,
+    ) -> Path:
+        """Convert files and stream them into a packed archive
+
+        shard is (unit, limit) with unit "bytes" or "tokens"; the export is
+        then written as numbered shards in a directory, which is returned.
+        """
+        with contextlib.ExitStack() as stack:
+            scratch = None
+            uncached = self.cache is None or any(f in self.windows for f in files)
+            if self.converter == "claude2md" or (
+                uncached and (max_tokens or shard or jobs > 1)
+            ):
+                # claude2md can only write into a directory, budgeting and
+                # sharding need every session rendered before packing, and
+                # parallel renders must not be left to the packer
+                scratch = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+            self.start_pool(stack, jobs)
+
+            # Convert on a bounded pool; map() keeps results in input order
+            converted = []
+            tally = {"converted": 0, "cached": 0, "timings": []}
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                results = pool.map(lambda f: self.convert_file(f, scratch), files)
+                for file, result in zip(files, results):
+                    if self.report_conversion(file, result, tally):
+                        converted.append((file, result[3]))
+
+            if not converted:
+                raise RuntimeError("No files were successfully converted")
+            self.print_conversion_summary(len(files), tally)
 
-            encoded_name = name_to_path[project_name]
-            project_path = self.projects_dir / encoded_name
+            if shard:
+                return self.write_shards(converted, shard, compression, dedup_min_bytes)
+            if max_tokens:
+                with self.profile("budget"):
+                    selected = self.apply_budget(converted, max_tokens)
+            else:
+                selected = [(file, md_path, None) for file, md_path in converted]
 
-            # Get .jsonl files in this project
-            for jsonl_file in project_path.glob("*.jsonl"):
-                file_time = datetime.fromtimestamp(jsonl_file.stat().st_mtime)
-                if file_time >= cutoff_time:
-                    filtered_files.append(jsonl_file)
+            output_path = self.output_path(compression)
+            print("Creating packed archive...")
+            entries = [self.archive_entry(file) for file, _, _ in selected]
+            with ArchiveWriter(
+                output_path, compression, dedup_min_bytes, self.redactor
+            ) as archive:
+                self.write_header(archive, entries)
+                for entry, (file, md_path, limit) in zip(entries, selected):
+                    self.pack_session(archive, entry["name"], file, md_path, limit)
+
+            self.finish_archive(archive)
+            return output_path
+
+    def write_shards(
+        self,
+        converted: List[Tuple[Path, Path]],
+        shard: Tuple[str, int],
+        compression: Optional[str],
+        dedup_min_bytes: Optional[int],
+    ) -> Path:
+        """Pack converted sessions into numbered shards of at most shard's limit"""
+        unit, limit = shard
+        with self.profile("pack"):
+            shards = plan_shards(
+                converted, self.archive_entry, limit, unit, dedup_min_bytes
+            )
+            output_dir = self.output_path(None).with_suffix("")
+            print(f"Writing {len(shards)} shards...")
+            manifest = write_shards(
+                shards,
+                output_dir,
+                unit,
+                limit,
+                compression,
+                dedup_min_bytes,
+                self.redactor,
+            )
 
-        return filtered_files
+        duplicates = sum(s["duplicates"] for s in manifest["shards"])
+        if duplicates:
+            saved = sum(s["saved_bytes"] for s in manifest["shards"])
+            print(
+                f"♻️  Replaced {duplicates} repeated blocks with references, "
+                f"saving {saved / 1024:.1f} KB"
+            )
+        self.report_filters()
+        if self.cache:
+            self.cache.evict()
+        return output_dir
+
+    def report_filters(self):
+        """Totals of the elision and redaction applied to this export"""
+        if self.policy and self.policy.elided:
+            print(
+                f"✂️  Elided {self.policy.elided} large tool results in newly "
+                f"rendered sessions, saving {format_bytes(self.policy.saved_bytes)}"
+            )
+        if self.redactor:
+            summary = self.redactor.summary()
+            found = ", ".join(
+                f"{kind} {count}" for kind, count in summary["matches"].items()
+            )
+            speed = summary["mb_per_s"]
+            print(
+                f"🔒 Redacted {sum(summary['matches'].values())} secrets"
+                + (f" ({found})" if found else "")
+                + f"; scanned {summary['scanned_mb']:.1f} MB"
+                + (f" at {speed:.0f} MB/s" if speed else "")
+            )
 
-    def process_files(self, files: List[Path]) -> Path:
-        """Convert files and create repomix archive"""
-        # Create temp directory
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_path = Path(temp_dir)
+    def export(
+        self,
+        project_names: List[str],
+        max_age_str: str,
+        jobs: int = 1,
+        compression: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        dedup_min_bytes: Optional[int] = DEFAULT_MIN_BYTES,
+        shard: Optional[Tuple[str, int]] = None,
+    ) -> Optional[Path]:
+        """Select, convert and pack sessions; None if no session matched"""
+        if max_tokens or shard:
+            # Budgets and shard plans are fitted over every converted
+            # session, so the phases cannot overlap
+            files = self.filter_files(project_names, max_age_str)
+            if not files:
+                return None
+            print(f"Found {len(files)} files to process...")
+            return self.process_files(
+                files, jobs, compression, max_tokens, dedup_min_bytes, shard
+            )
+        return asyncio.run(
+            self.export_pipeline(
+                project_names, max_age_str, jobs, compression, dedup_min_bytes
+            )
+        )
 
-            # Convert each file
-            converted_count = 0
-            for file in files:
+    async def export_pipeline(
+        self,
+        project_names: List[str],
+        max_age_str: str,
+        jobs: int = 1,
+        compression: Optional[str] = None,
+        dedup_min_bytes: Optional[int] = DEFAULT_MIN_BYTES,
+    ) -> Optional[Path]:
+        """Overlap discovery, conversion and packing
+
+        Discovery feeds a bounded queue that jobs converter tasks drain from
+        the first matching session on. The packer writes the table of contents
+        once discovery is done, then streams each session, in order, as soon as
+        its conversion finishes, so the export takes about as long as its
+        slowest stage rather than the sum of all three.
+        """
+        self.parse_age(max_age_str)  # Fail before any task starts
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=jobs * 2)
+        pending: List[Tuple[Path, asyncio.Future]] = []
+        tally = {"converted": 0, "cached": 0, "timings": []}
+
+        with contextlib.ExitStack() as stack:
+            scratch = None
+            if self.converter == "claude2md" or jobs > 1:
+                scratch = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+            self.start_pool(stack, jobs)
+            convert_pool = stack.enter_context(ThreadPoolExecutor(max_workers=jobs))
+            # Archive writes are blocking I/O; one thread keeps them in order
+            pack_pool = stack.enter_context(ThreadPoolExecutor(max_workers=1))
+
+            async def discover():
+                # The index connection belongs to this thread, so discovery
+                # runs on the loop and yields to the other stages per session
                 try:
-                    print(f"Converting {file.name}...")
-                    subprocess.run(
-                        ["claude2md", str(file), str(temp_path)],
-                        capture_output=True,
-                        text=True,
-                        check=True,
+                    for file in self.iter_files(project_names, max_age_str):
+                        future = loop.create_future()
+                        pending.append((file, future))
+                        await queue.put((file, future))
+                        await asyncio.sleep(0)
+                finally:
+                    for _ in range(jobs):
+                        await queue.put(None)
+
+            async def convert():
+                while (item := await queue.get()) is not None:
+                    file, future = item
+                    result = await loop.run_in_executor(
+                        convert_pool, self.convert_file, file, scratch
                     )
-                    converted_count += 1
-                except subprocess.CalledProcessError as e:
-                    print(f"Warning: Failed to convert {file.name}: {e.stderr}")
-                    continue
-                except Exception as e:
-                    print(f"Warning: Error converting {file.name}: {e}")
-                    continue
+                    future.set_result(result)
 
-            if converted_count == 0:
+            converters = [asyncio.create_task(convert()) for _ in range(jobs)]
+            try:
+                await discover()
+                if not pending:
+                    return None
+                print(f"Found {len(pending)} files to process...")
+                output_path = await self.pack_pipeline(
+                    pending, pack_pool, compression, dedup_min_bytes, tally
+                )
+            finally:
+                for task in converters:
+                    task.cancel()
+                await asyncio.gather(*converters, return_exceptions=True)
+
+        return output_path
+
+    async def pack_pipeline(
+        self,
+        pending: List[Tuple[Path, asyncio.Future]],
+        pack_pool: ThreadPoolExecutor,
+        compression: Optional[str],
+        dedup_min_bytes: Optional[int],
+        tally: Dict,
+    ) -> Path:
+        """Stream sessions into the archive in order as their conversions finish"""
+        loop = asyncio.get_running_loop()
+        output_path = self.output_path(compression)
+        entries = [self.archive_entry(file) for file, _ in pending]
+        print("Creating packed archive...")
+        with ArchiveWriter(
+            output_path, compression, dedup_min_bytes, self.redactor
+        ) as archive:
+            await loop.run_in_executor(pack_pool, self.write_header, archive, entries)
+            for entry, (file, future) in zip(entries, pending):
+                result = await future
+                if self.report_conversion(file, result, tally):
+                    await loop.run_in_executor(
+                        pack_pool,
+                        self.pack_session,
+                        archive,
+                        entry["name"],
+                        file,
+                        result[3],
+                    )
+                else:
+                    # The table of contents already lists it
+                    out = archive.begin(entry["name"])
+                    out.write(f"\n[conversion failed: {result[0]}]\n")
+            if not tally["converted"]:
                 raise RuntimeError("No files were successfully converted")
 
-            print(f"\nConverted {converted_count}/{len(files)} files")
+        self.print_conversion_summary(len(pending), tally)
+        self.finish_archive(archive)
+        return output_path
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """Bring the full-text index up to date and return the best matches"""
+        self.index.refresh(full=self.rescan)
+        self.rescan = False
+        search_index = SearchIndex(self.index, self.redactor)
+
+        start = time.perf_counter()
+        added = search_index.update()
+        if added:
+            elapsed = time.perf_counter() - start
+            print(f"Indexed {added} new messages ({elapsed:.2f}s)")
+
+        start = time.perf_counter()
+        results = search_index.search(query, limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"\n🔎 {len(results)} matches for {query!r} ({elapsed_ms:.0f} ms)")
+        return results
+
+    def display_search_results(self, results: List[Dict]):
+        """Print search hits with their project, session and snippet"""
+        for hit in results:
+            session = Path(hit["path"]).name
+            print(
+                f"\n{unquote(hit['project'])} · {session} · "
+                f"{hit['timestamp'] or 'no timestamp'} ({hit['role']})"
+            )
+            print(f"   {' '.join(hit['snippet'].split())}")
+
+    def get_stats(
+        self,
+        project_names: Optional[List[str]] = None,
+        max_age_str: str = None,
+        update: bool = True,
+    ) -> Dict[str, List[Dict]]:
+        """Per-project and per-day usage rollups, parsing only changed files
+
+        With update False, the cached aggregates are read as they are.
+        """
+        self.registry()  # Brings the manifest up to date for the stats pass
+        encoded = None
+        if project_names:
+            encoded = self.select_projects(project_names)
+
+        since = None
+        if max_age_str:
+            cutoff = datetime.now(timezone.utc) - self.parse_age(max_age_str)
+            since = cutoff.strftime("%Y-%m-%d")
+
+        stats = SessionStats(self.index)
+        if update:
+            start = time.perf_counter()
+            parsed = stats.update()
+            if parsed:
+                elapsed = time.perf_counter() - start
+                print(f"Parsed {parsed} new or changed sessions ({elapsed:.2f}s)")
+        return stats.rollups(encoded, since)
+
+    def display_stats(self, rollups: Dict[str, List[Dict]], max_days: int = 14):
+        """Print usage tables per project and per day"""
+        if not rollups["projects"]:
+            print("No sessions found for these filters")
+            return
+
+        def tokens(row):
+            # Cached prompt tokens are still input the model had to read
+            read = (
+                row["input_tokens"]
+                + row["cache_read_tokens"]
+                + row["cache_creation_tokens"]
+            )
+            return f"{read:>12,}  {row['output_tokens']:>10,}"
 
-            # Run repomix to create packed archive
-            timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-            output_path = Path(f"/tmp/claude-chats-{timestamp}.txt")
+        names = [unquote(p["project"]) for p in rollups["projects"]]
+        name_width = max(20, *(len(name) for name in names))
+        print("\n📊 USAGE BY PROJECT:")
+        print(
+            f"{'Project':<{name_width}}  {'Sessions':>8}  {'Prompts':>8}  "
+            f"{'Replies':>8}  {'Tools':>7}  {'Input tok':>12}  {'Output tok':>10}  "
+            f"{'Hours':>6}"
+        )
+        print("-" * (name_width + 80))
+        for row in rollups["projects"]:
+            print(
+                f"{unquote(row['project']):<{name_width}}  {row['sessions']:>8}  "
+                f"{row['user_messages']:>8}  {row['assistant_messages']:>8}  "
+                f"{row['tool_calls']:>7}  {tokens(row)}  "
+                f"{row['duration'] / 3600:>6.1f}"
+            )
 
-            print("Creating packed archive...")
-            try:
-                # Change to temp directory for repomix
-                original_cwd = os.getcwd()
-                os.chdir(temp_path)
-
-                subprocess.run(
-                    ["repomix", "-o", str(output_path)],
-                    capture_output=True,
-                    text=True,
-                    check=True,
-                )
+        tools = {}
+        for row in rollups["projects"]:
+            for name, n in row["tools"].items():
+                tools[name] = tools.get(name, 0) + n
+        if tools:
+            top = sorted(tools.items(), key=lambda t: t[1], reverse=True)[:10]
+            print("\n🔧 TOOL CALLS:")
+            print("   " + ", ".join(f"{name} {n:,}" for name, n in top))
+
+        days = rollups["days"][-max_days:]
+        print(f"\n📅 USAGE BY DAY (last {len(days)} active days, UTC):")
+        print(
+            f"{'Day':<10}  {'Sessions':>8}  {'Prompts':>8}  {'Replies':>8}  "
+            f"{'Tools':>7}  {'Input tok':>12}  {'Output tok':>10}"
+        )
+        print("-" * 80)
+        for row in days:
+            print(
+                f"{row['day']:<10}  {row['sessions']:>8}  {row['user_messages']:>8}  "
+                f"{row['assistant_messages']:>8}  {row['tool_calls']:>7}  {tokens(row)}"
+            )
 
-                os.chdir(original_cwd)
+    def watch(self):
+        """Keep the manifest, search index, stats and conversions current"""
+        self.index.refresh(full=self.rescan)
+        search_index = SearchIndex(self.index, self.redactor)
+        stats = SessionStats(self.index)
+        search_index.update()
+        stats.update()
+
+        def on_change(paths):
+            start = time.perf_counter()
+            sessions = [p for p in paths if p.suffix == ".jsonl"]
+            # Directory events (new projects, overflow) need a listing;
+            # session events are applied directly
+            if len(sessions) < len(paths):
+                self.index.refresh()
+            self.index.update_files(sessions)
+            indexed = search_index.update()
+            stats.update()
+
+            refreshed = 0
+            if self.cache and self.converter == "native":
+                for file in sessions:
+                    if file.exists() and not self.convert_file(file)[0]:
+                        refreshed += 1
+                # Extensions supersede entries; keep the cache under its limit
+                self.cache.evict()
 
-                if output_path.exists():
-                    return output_path
-                else:
-                    raise RuntimeError("Repomix completed but output file not found")
+            print(
+                f"[{datetime.now():%H:%M:%S}] {len(sessions)} sessions changed: "
+                f"{indexed} messages indexed, {refreshed} conversions refreshed "
+                f"({time.perf_counter() - start:.2f}s)"
+            )
 
-            except subprocess.CalledProcessError as e:
-                os.chdir(original_cwd)
-                raise RuntimeError(f"Repomix failed: {e.stderr}")
-            except FileNotFoundError:
-                os.chdir(original_cwd)
-                raise RuntimeError(
-                    "Repomix not found. Please install it: npm install -g repomix"
+        watcher = make_watcher(self.projects_dir)
+        print(f"👀 Watching {self.projects_dir} ({watcher.kind}), Ctrl+C to stop")
+        watch(watcher, on_change)
+
+    def serve(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        dedup_min_bytes: Optional[int] = DEFAULT_MIN_BYTES,
+    ):
+        """Answer dashboard queries over HTTP until interrupted (see chat_serve)"""
+        try:
+            asyncio.run(serve(self, host, port, dedup_min_bytes))
+        except KeyboardInterrupt:
+            pass
+
+    def find_session(self, session: str) -> Optional[Path]:
+        """A session by path, or by its id (file stem) in the index"""
+        path = Path(session).expanduser()
+        if path.is_file():
+            return path
+        self.index.refresh(full=self.rescan)
+        for file, _, _, _ in self.index.all_files():
+            if file.stem == session:
+                return file
+        bundled = self.bundles.find(session)
+        return self.bundles.extract(bundled) if bundled else None
+
+    def archive_sessions(self, project_names: List[str], max_age_str: str) -> Dict:
+        """Move sessions last written before max_age into per-project bundles
+
+        The search index and stats are brought up to date first, so the
+        moved sessions stay searchable and counted.
+        """
+        cutoff = (datetime.now() - self.parse_age(max_age_str)).timestamp()
+        projects = set(self.select_projects(project_names))
+        SearchIndex(self.index, self.redactor).update()
+        SessionStats(self.index).update()
+        old = [
+            (path, str(path.parent.parent), project, size, mtime)
+            for path, project, size, mtime in self.index.all_files()
+            if project in projects and mtime < cutoff
+        ]
+        totals = self.bundles.archive(old)
+        self.index.refresh()
+        return totals
+
+    def read_session(
+        self,
+        path: Path,
+        last_turns: Optional[int] = None,
+        between: Optional[List[str]] = None,
+        thread: str = "all",
+    ) -> List[Dict]:
+        """Records of one session by time window, last turns or thread
+
+        Only the selected lines are parsed. A thread other than "all" without
+        a window or turn count returns the whole thread.
+        """
+        start = time.perf_counter()
+        keep = SessionGraph.build(path).select(thread)
+        with SessionReader(path) as reader:
+            if between:
+                bounds = [parse_timestamp(value) for value in between]
+                if None in bounds:
+                    raise ValueError("--between expects ISO timestamps")
+                records = list(reader.between(*bounds, keep))
+            elif last_turns or keep is None:
+                records = reader.last_turns(last_turns or 1, keep)
+            else:
+                records = [reader.record(i) for i in sorted(keep) if i < len(reader)]
+                records = [record for record in records if record]
+            lines = len(reader)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(
+            f"{len(records)} of {lines} records from {path.name} ({elapsed_ms:.0f} ms)",
+            file=sys.stderr,
+        )
+        return records
+
+    def display_branches(self, path: Path):
+        """List the conversation branches of a session, newest tip last"""
+        graph = SessionGraph.build(path)
+        main = graph.main_leaf()
+        print(f"\n🌿 BRANCHES of {path.name}:")
+        print(f"{'Tip':<36}  {'Depth':>6}  {'Timestamp':<24}  Last message")
+        print("-" * 100)
+        with SessionReader(path) as reader:
+            for leaf in graph.leaves():
+                record = reader.record(leaf) if leaf < len(reader) else None
+                record = record or {}
+                text = chat_converter.record_text(record)
+                if self.redactor:
+                    text = self.redactor.redact(text)
+                text = " ".join(text.split())[:40]
+                marker = ""
+                if leaf == main:
+                    marker = " (main)"
+                elif graph.sidechain[leaf]:
+                    marker = " (sub-agent)"
+                print(
+                    f"{graph.uuids[leaf]:<36}  {len(graph.path_to(leaf)):>6}  "
+                    f"{record.get('timestamp', ''):<24}  {text}{marker}"
                 )
 
     def display_projects(self, projects: List[Dict]):
         """Pretty print project information with highlights"""
         if not projects:
-            print("No projects found in ~/.claude/projects/")
+            print(f"No projects found in {', '.join(map(str, self.roots))}")
             return
 
         # Calculate column widths
@@ -293,30 +1038,415 @@ class ChatAnalyzer:
 
 def main():
     parser = argparse.ArgumentParser(description="Analyze Claude conversation logs")
-    parser.add_argument("--projects", help="Comma-separated project names")
+    parser.add_argument(
+        "--projects",
+        help="Comma-separated project names, globs (client-*) or re:REGEX patterns",
+    )
+    parser.add_argument(
+        "--all", action="store_true", help="Select every project (with --max-age)"
+    )
     parser.add_argument("--max-age", help="Maximum file age (e.g., 1h, 2d, 1w)")
+    parser.add_argument(
+        "--root",
+        type=Path,
+        action="append",
+        metavar="DIR",
+        help="A projects directory to read; repeat to merge trees synced from "
+        "several machines (default: ~/.claude/projects)",
+    )
+    parser.add_argument(
+        "--rescan",
+        action="store_true",
+        help="Ignore the cached session index and rescan every project",
+    )
+    parser.add_argument(
+        "--scan-workers",
+        type=int,
+        default=SCAN_WORKERS,
+        help="Threads stat'ing project directories while refreshing the index; "
+        f"raise on network home directories (default: {SCAN_WORKERS})",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["text", "json"],
+        default="text",
+        help="Discovery output: the report, or JSON for dashboards",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of sessions to convert in parallel, each native render in "
+        "its own worker process (default: 1)",
+    )
+    parser.add_argument(
+        "--converter",
+        choices=["native", "claude2md"],
+        default="native",
+        help="Session converter: built-in streaming renderer or external claude2md",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=["gzip", "zstd"],
+        help="Compress the output archive",
+    )
+    size_limits = parser.add_mutually_exclusive_group()
+    size_limits.add_argument(
+        "--max-tokens",
+        type=int,
+        help="Token budget for the export; newest sessions are kept first",
+    )
+    size_limits.add_argument(
+        "--shard-size",
+        type=float,
+        metavar="MB",
+        help="Split the export into numbered shards of at most this many MB",
+    )
+    size_limits.add_argument(
+        "--shard-tokens",
+        type=int,
+        help="Split the export into numbered shards of at most this many tokens",
+    )
+    parser.add_argument(
+        "--search",
+        metavar="QUERY",
+        help="Full-text search across all conversations (SQLite FTS5 syntax)",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=20,
+        help="Maximum number of search results (default: 20)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Usage report per project and day (filter with --projects/--max-age)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep indexes and cached conversions current as sessions change",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Serve projects, sessions, search, stats and exports as a read-only "
+        "JSON/HTTP API for dashboards",
+    )
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_HOST,
+        help=f"With --serve: address to listen on (default: {DEFAULT_HOST})",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"With --serve: port to listen on (default: {DEFAULT_PORT})",
+    )
+    parser.add_argument(
+        "--session",
+        metavar="PATH_OR_ID",
+        help="Print part of one session as Markdown (with --last-turns or --between)",
+    )
+    parser.add_argument(
+        "--last-turns",
+        type=int,
+        help="With --session: number of most recent turns to print (default: 1)",
+    )
+    parser.add_argument(
+        "--thread",
+        default="all",
+        help="Records to export: all, main (live conversation without abandoned "
+        "branches or sub-agents) or sidechains; with --session also a branch "
+        "tip uuid (default: all)",
+    )
+    parser.add_argument(
+        "--branches",
+        action="store_true",
+        help="With --session: list conversation branches and their tip uuids",
+    )
+    parser.add_argument(
+        "--between",
+        nargs=2,
+        metavar=("START", "END"),
+        help="With --session: print records timestamped in this ISO time range",
+    )
+    parser.add_argument(
+        "--elide",
+        action="store_true",
+        help="Cut large tool results with the built-in per-tool policy",
+    )
+    parser.add_argument(
+        "--elide-policy",
+        type=Path,
+        metavar="JSON",
+        help="Cut large tool results with the per-tool policy in this file",
+    )
+    parser.add_argument(
+        "--archive",
+        metavar="AGE",
+        help="Move sessions of --projects (or --all) last written more than AGE "
+        "ago into per-project zip bundles",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        type=Path,
+        default=ARCHIVE_DIR,
+        help=f"Where bundles are kept (default: {ARCHIVE_DIR})",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="JSON",
+        help="Write per-stage wall/CPU time, conversion latencies and peak memory "
+        "of an export as JSON (default: next to the export)",
+    )
+    parser.add_argument(
+        "--profile-dump",
+        type=Path,
+        metavar="PSTATS",
+        help="With --profile, also write cProfile stats of the whole run, "
+        "all threads together",
+    )
+    parser.add_argument(
+        "--no-redact",
+        action="store_true",
+        help="Keep API keys and tokens in the export instead of scrubbing them",
+    )
+    parser.add_argument(
+        "--redact-pattern",
+        action="append",
+        default=[],
+        metavar="REGEX",
+        help="Also scrub text matching REGEX from exports (repeatable)",
+    )
+    parser.add_argument(
+        "--dedup-min-size",
+        type=int,
+        default=DEFAULT_MIN_BYTES,
+        help="Replace repeats of tool outputs at least this many bytes with a "
+        f"reference to the first copy, 0 disables it (default: {DEFAULT_MIN_BYTES})",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_MB,
+        help=f"Conversion cache limit in MB, 0 disables it (default: {DEFAULT_CACHE_MB})",
+    )
 
     args = parser.parse_args()
-    analyzer = ChatAnalyzer()
+    policy = None
+    if args.elide or args.elide_policy:
+        try:
+            policy = ElisionPolicy.load(args.elide_policy)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    redactor = None
+    if not args.no_redact:
+        try:
+            redactor = SecretRedactor(args.redact_pattern)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    profiler = None
+    if args.profile is not None or args.profile_dump:
+        if not (args.projects or args.all):
+            print("Error: --profile measures an export; add --projects or --all")
+            sys.exit(1)
+        profiler = Profiler(args.profile_dump)
+    analyzer = ChatAnalyzer(
+        rescan=args.rescan,
+        converter=args.converter,
+        cache_mb=args.cache_size,
+        thread=args.thread,
+        elide_policy=policy,
+        roots=[root.expanduser().resolve() for root in args.root or []],
+        profiler=profiler,
+        scan_workers=max(1, args.scan_workers),
+        archive_dir=args.archive_dir.expanduser(),
+        redactor=redactor,
+    )
+    if args.root:
+        missing = [str(root) for root in analyzer.roots if not root.is_dir()]
+        if missing:
+            print(f"Error: {', '.join(missing)} is not a directory")
+            sys.exit(1)
 
-    if args.projects and args.max_age:
-        # Processing mode
-        project_names = [p.strip() for p in args.projects.split(",")]
+    if args.watch:
+        # Watch mode
+        if len(analyzer.roots) > 1:
+            print("Error: --watch follows a single --root")
+            sys.exit(1)
+        if not analyzer.projects_dir.exists():
+            print(f"Error: {analyzer.projects_dir} does not exist")
+            sys.exit(1)
+        analyzer.watch()
+        sys.exit(0)
 
+    if args.serve:
+        # API mode
+        if args.converter != "native":
+            print("Error: --serve renders sessions with the native converter")
+            sys.exit(1)
+        if args.thread not in THREADS:
+            print(f"Error: --thread must be one of {', '.join(THREADS)} for --serve")
+            sys.exit(1)
         try:
-            files = analyzer.filter_files(project_names, args.max_age)
+            analyzer.serve(args.host, args.port, args.dedup_min_size)
+        except OSError as e:
+            print(f"Error: Cannot listen on {args.host}:{args.port}: {e}")
+            sys.exit(1)
+        sys.exit(0)
 
-            if not files:
+    if args.archive:
+        # Archive mode
+        if not (args.projects or args.all):
+            print("Error: --archive needs --projects or --all")
+            sys.exit(1)
+        project_names = ["*"] if args.all else args.projects.split(",")
+        try:
+            totals = analyzer.archive_sessions(
+                [p.strip() for p in project_names], args.archive
+            )
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if not totals["sessions"]:
+            print(f"No sessions older than {args.archive}")
+            sys.exit(0)
+        print(
+            f"📦 Archived {totals['sessions']} sessions into {totals['bundles']} "
+            f"bundles in {analyzer.bundles.archive_dir}: "
+            f"{format_bytes(totals['bytes_in'])} -> "
+            f"{format_bytes(totals['bytes_out'])}"
+        )
+        sys.exit(0)
+
+    if args.session:
+        # Session reader mode
+        path = analyzer.find_session(args.session)
+        if path is None:
+            print(f"Error: Session '{args.session}' not found")
+            sys.exit(1)
+        if args.branches:
+            analyzer.display_branches(path)
+            sys.exit(0)
+        try:
+            if args.last_turns is not None and args.last_turns < 1:
+                raise ValueError("--last-turns must be at least 1")
+            records = analyzer.read_session(
+                path, args.last_turns, args.between, args.thread
+            )
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        out = redactor.wrap(sys.stdout) if redactor else sys.stdout
+        for record in records:
+            out.write(chat_converter.render_record(record))
+        out.flush()
+        sys.exit(0 if records else 1)
+
+    if args.search:
+        # Search mode
+        results = analyzer.search(args.search, args.limit)
+        analyzer.display_search_results(results)
+        sys.exit(0 if results else 1)
+
+    if args.stats:
+        # Analytics mode
+        project_names = None
+        if args.projects and not args.all:
+            project_names = [p.strip() for p in args.projects.split(",")]
+        try:
+            rollups = analyzer.get_stats(project_names, args.max_age)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        analyzer.display_stats(rollups)
+        sys.exit(0)
+
+    if (args.projects or args.all) and args.max_age:
+        # Processing mode
+        if args.all:
+            project_names = ["*"]
+        else:
+            project_names = [p.strip() for p in args.projects.split(",")]
+
+        try:
+            if args.jobs < 1:
+                raise ValueError("--jobs must be at least 1")
+            if args.max_tokens is not None and args.max_tokens < 1:
+                raise ValueError("--max-tokens must be positive")
+            if args.thread not in THREADS:
+                raise ValueError(
+                    f"--thread must be one of {', '.join(THREADS)} for exports; "
+                    "branches can be read with --session"
+                )
+            if args.converter == "claude2md" and (args.thread != "all" or policy):
+                raise ValueError("--thread and --elide need the native converter")
+            shard = None
+            if args.shard_size is not None:
+                shard = ("bytes", int(args.shard_size * 1024 * 1024))
+            elif args.shard_tokens is not None:
+                shard = ("tokens", args.shard_tokens)
+            if shard and shard[1] < 1:
+                raise ValueError("Shard limits must be positive")
+
+            output_path = analyzer.export(
+                project_names,
+                args.max_age,
+                jobs=args.jobs,
+                compression=args.compress,
+                max_tokens=args.max_tokens,
+                dedup_min_bytes=args.dedup_min_size,
+                shard=shard,
+            )
+            if output_path is None:
                 print("No matching files found")
                 sys.exit(1)
 
-            print(f"Found {len(files)} files to process...")
-            output_path = analyzer.process_files(files)
             print(f"\n{'=' * 80}")
             print("✅ EXPORT SUCCESSFUL!")
             print(f"{'=' * 80}")
-            print(f"\n📄 Output file: {output_path}")
-            print(f"📏 File size: {output_path.stat().st_size / (1024 * 1024):.1f} MB")
+            if output_path.is_dir():
+                shards = sorted(output_path.glob("shard-*"))
+                print(f"\n📁 Output directory: {output_path} ({len(shards)} shards)")
+                for shard_path in shards:
+                    size_mb = shard_path.stat().st_size / (1024 * 1024)
+                    print(f"   {shard_path.name}  {size_mb:.1f} MB")
+                print("   manifest.json lists the sessions in each shard")
+            else:
+                print(f"\n📄 Output file: {output_path}")
+                size_mb = output_path.stat().st_size / (1024 * 1024)
+                print(f"📏 File size: {size_mb:.1f} MB")
+            if profiler:
+                report_path = (
+                    Path(args.profile)
+                    if args.profile
+                    else output_path.with_name(
+                        f"{output_path.name.split('.')[0]}-profile.json"
+                    )
+                )
+                outputs = (
+                    sorted(output_path.iterdir())
+                    if output_path.is_dir()
+                    else [output_path]
+                )
+                report = profiler.write(report_path, outputs)
+                print(f"\n⏱️  Profile: {report_path}")
+                for name, stage in sorted(
+                    report["stages"].items(), key=lambda s: -s[1]["wall_s"]
+                ):
+                    print(
+                        f"   {name:<10} {stage['wall_s']:>8.2f}s wall "
+                        f"{stage['cpu_s']:>8.2f}s CPU  {stage['calls']:>6} calls"
+                    )
+                if "cprofile" in report:
+                    print(f"   cProfile of the whole run: {report['cprofile']['path']}")
             print("\n💡 Next steps:")
             print(f"   1. Copy this path: {output_path}")
             print("   2. Open a new Claude chat")
@@ -335,14 +1465,32 @@ def main():
 
     else:
         # Discovery mode
-        if args.projects or args.max_age:
+        if args.projects or args.all or args.max_age:
             print(
-                "Error: Both --projects and --max-age are required for processing mode"
+                "Error: --max-age and --projects (or --all) are required "
+                "for processing mode"
             )
             sys.exit(1)
 
         projects = analyzer.get_project_info()
+        if args.format == "json":
+            json.dump(
+                {
+                    "roots": [str(root) for root in analyzer.roots],
+                    "duplicates": analyzer.index.duplicates,
+                    "projects": projects,
+                },
+                sys.stdout,
+                indent=2,
+            )
+            print()
+            sys.exit(0)
         analyzer.display_projects(projects)
+        if analyzer.index.duplicates:
+            print(
+                f"\n♻️  {analyzer.index.duplicates} sessions found under more than "
+                f"one of {len(analyzer.roots)} roots were counted once"
+            )
 
         if projects:
             print(
@@ -0,0 +1,55 @@
+"""Shard plans hold their limit once deduplication has marked the blocks."""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "make" / "tools"))
+
+from chat_dedup import DEFAULT_MIN_BYTES  # noqa: E402
+from chat_shards import plan_shards, write_shards  # noqa: E402
+
+
+def fenced(rows):
+    return "```\n" + "\n".join(rows) + "\n```\n\n"
+
+
+@pytest.fixture
+def converted(tmp_path):
+    """Sessions of large fenced blocks, half of them repeated across sessions"""
+    rng = random.Random(7)
+    shared = [
+        [f"row {k} {rng.random()}" for k in range(rng.randint(80, 160))]
+        for _ in range(20)
+    ]
+    sessions = []
+    for n in range(8):
+        md_path = tmp_path / f"session-{n}.md"
+        parts = [f"# Claude session {n}\n\n"]
+        for i in range(20):
+            if rng.random() < 0.5:
+                rows = rng.choice(shared)
+            else:
+                rows = [f"own {rng.random()}" for _ in range(120)]
+            parts.append(f"## 🔧 Result {i}\n\n" + fenced(rows))
+        md_path.write_text("".join(parts), encoding="utf-8")
+        sessions.append((tmp_path / f"session-{n}.jsonl", md_path))
+    return sessions
+
+
+def entry(file):
+    return {"name": f"project/{file.stem}.md", "size": 4096, "mtime": 0.0}
+
+
+@pytest.mark.parametrize("limit", [20_000, 31_457, 52_428])
+def test_shards_with_dedup_stay_within_limit(tmp_path, converted, limit):
+    shards = plan_shards(converted, entry, limit, "bytes", DEFAULT_MIN_BYTES)
+    manifest = write_shards(
+        shards, tmp_path / "out", "bytes", limit, dedup_min_bytes=DEFAULT_MIN_BYTES
+    )
+
+    assert sum(s["duplicates"] for s in manifest["shards"])
+    for shard in manifest["shards"]:
+        assert shard["bytes"] <= limit, shard["file"]